@@ -3,7 +3,7 @@ from __future__ import annotations
 import re
 from dataclasses import MISSING, dataclass, field, fields
 from fractions import Fraction
-from itertools import chain, repeat
+from itertools import chain
 from logging import getLogger
 from textwrap import wrap
 from typing import TYPE_CHECKING, ClassVar, List, Optional, Union
@@ -19,7 +19,7 @@ else:
     from functools import cached_property
 
 if TYPE_CHECKING:
-    from typing import Tuple, Dict, Iterator, Set, Callable
+    from typing import Tuple, Dict, Iterator, Sequence, Set, Callable
 
     from panflute.base import Inline, Block
     from panflute.elements import Doc
@@ -29,11 +29,13 @@ import yaml
 from panflute.containers import ListContainer
 from panflute.elements import CodeBlock, Para, Plain, Span, Str
 from panflute.table_elements import Caption, Table, TableBody, TableCell, TableFoot, TableHead, TableRow
-from panflute.tools import convert_text, stringify
+from panflute.tools import stringify
 
-from .io import dump_csv_io, load_csv_array
-from .util import (get_types, get_yaml_dumper, iter_convert_texts_markdown_to_panflute,
-                   iter_convert_texts_panflute_to_markdown)
+from .converter import convert_text
+from .io import (dump_arrow_io, dump_csv_io, expand_include, infer_format, load_arrow_array, load_csv_array,
+                 load_include_files, load_json_array, load_sqlite_array)
+from .util import (convert_groups, get_types, get_yaml_dumper, is_markdown_independent, is_panflute_independent,
+                   iter_convert_texts_markdown_to_panflute, iter_convert_texts_panflute_to_markdown)
 
 COLWIDTHDEFAULT = 'ColWidthDefault'
 
@@ -68,6 +70,108 @@ class Ica:
     classes: List[str] = field(default_factory=list)
     attributes: Dict[str, str] = field(default_factory=dict)
 
+    # a subset of pandoc's markdown attribute syntax
+    _space_pat: ClassVar = re.compile(r'[ \t]*')
+    _name_pat: ClassVar = re.compile(r'[\w\-:.]+')
+    _identifier_pat: ClassVar = re.compile(r'#([\w\-:.]+)')
+    _class_pat: ClassVar = re.compile(r'\.([^\W\d_][\w\-:.]*)')
+    _unnumbered_pat: ClassVar = re.compile(r'-(?=[\s}])')
+    _key_pat: ClassVar = re.compile(r'([^\W\d_][\w\-:.]*)=')
+    _quoted_pat: ClassVar = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'', re.DOTALL)
+    _unquoted_pat: ClassVar = re.compile(r'(?:[^\s}"\'\\]|\\[!-/:-@[-`{-~])*')
+    _escape_pat: ClassVar = re.compile(r'\\([!-/:-@[-`{-~])')
+
+    @classmethod
+    def from_markdown(cls, text: str) -> Optional[Ica]:
+        '''parse the markdown of an empty Span such as `[]{#id .class key="value"}`
+
+        This follows pandoc's syntax of attributes without calling pandoc,
+        for the subset of it that can be parsed unambiguously.
+
+        :return: None if text is not parsed here, then it should be parsed by pandoc instead,
+            c.f. `from_panflute_ast`
+        '''
+        # most cells have no attributes
+        if not text:
+            return cls()
+        # a line starting with - in attributes would be a list
+        if not text.startswith('[]{') or '\n' in text:
+            return None
+        identifier = ''
+        classes: List[str] = []
+        attributes: Dict[str, str] = {}
+        pos = cls._space_pat.match(text, 3).end()
+        end = len(text) - 1
+        while pos < end:
+            match = cls._identifier_pat.match(text, pos)
+            if match is not None:
+                identifier = match[1]
+                pos = cls._space_pat.match(text, match.end()).end()
+                continue
+            match = cls._class_pat.match(text, pos)
+            if match is not None:
+                classes.append(match[1])
+                pos = cls._space_pat.match(text, match.end()).end()
+                continue
+            match = cls._unnumbered_pat.match(text, pos)
+            if match is not None:
+                classes.append('unnumbered')
+                pos = cls._space_pat.match(text, match.end()).end()
+                continue
+            match = cls._key_pat.match(text, pos)
+            if match is None:
+                return None
+            key = match[1]
+            pos = match.end()
+            match = cls._quoted_pat.match(text, pos)
+            if match is not None:
+                value = match[1] if match[2] is None else match[2]
+                # pandoc also normalizes whitespaces and resolves entities in quoted values
+                if any(char in value for char in '\t\n\r&'):
+                    return None
+            else:
+                match = cls._unquoted_pat.match(text, pos)
+                value = match[0]
+            value = cls._escape_pat.sub(r'\1', value)
+            if key == 'id':
+                identifier = value
+            elif key == 'class':
+                classes += value.split()
+            else:
+                attributes[key] = value
+            pos = cls._space_pat.match(text, match.end()).end()
+        if pos != end or text[end] != '}':
+            return None
+        return cls(identifier=identifier, classes=classes, attributes=attributes)
+
+    def to_markdown(self) -> Optional[str]:
+        '''to markdown of an empty Span as pandoc would write it
+
+        :return: None if pandoc might write it differently, such as wrapping a long line
+        '''
+        identifier = self.identifier
+        classes = self.classes
+        attributes = self.attributes
+        # most cells have no attributes
+        if not (identifier or classes or attributes):
+            return ''
+        parts = [f'#{identifier}'] if identifier else []
+        parts += [f'.{class_}' for class_ in classes]
+        for key, value in attributes.items():
+            if any(char in value for char in '\t\n\r'):
+                return None
+            value = value.replace('\\', '\\\\').replace('"', '\\"')
+            parts.append(f'{key}="{value}"')
+        # pandoc escapes other characters
+        name_pat = self._name_pat
+        if not all(name_pat.fullmatch(name) for name in chain(classes, attributes)) or (identifier and not name_pat.fullmatch(identifier)):
+            return None
+        res = f"[]{{{' '.join(parts)}}}"
+        # pandoc wraps lines at 72 columns, assume non-ASCII characters are wide
+        if len(res) + sum(ord(char) > 127 for char in res) > 72:
+            return None
+        return res
+
     def to_panflute_ast(self) -> ListContainer[Plain]:
         '''to panflute AST element
 
@@ -113,16 +217,26 @@ class PanTableOption:
     ns_head: Optional[List[int]] = None
     markdown: bool = False
     fancy_table: bool = False
-    include: str = ''
+    include: Union[str, List[str]] = ''
     include_encoding: str = ''
-    format: str = 'csv'
+    include_index: bool = False
+    # None means inferred from include, c.f. `format_default`
+    format: Optional[str] = None
     csv_kwargs: dict = field(default_factory=dict)
+    query: str = ''
+    rows: Optional[List[Optional[int]]] = None
+    head: Optional[int] = None
+    tail: Optional[int] = None
+    columns: Optional[List[Union[int, str]]] = None
 
     def __post_init__(self):
         '''fall back to default if invalid type
 
         Only check for type here. e.g. positivity of width and table_width are not checked at this point.
         '''
+        # a single column, before it is cast into a list of characters below
+        if type(self.columns) in (int, str):
+            self.columns = [self.columns]
         types_dict = get_types(self.__class__)
         for field_ in fields(self):
             key = field_.name
@@ -155,6 +269,47 @@ class PanTableOption:
                 except (ValueError, TypeError):
                     logger.error(f"Option {key.replace('_', '-')} with value {value} has invalid type and set to default: None")
                     setattr(self, key, None)
+        # check rows is [start, stop], where None means unbounded
+        rows = self.rows
+        if rows is not None:
+            try:
+                if len(rows) != 2:
+                    raise ValueError
+                self.rows = [None if x is None else int(x) for x in rows]
+            except (ValueError, TypeError):
+                logger.error(f"Option rows with value {rows} should be [start, stop] and set to default: None")
+                self.rows = None
+        for key in ('head', 'tail'):
+            value = getattr(self, key)
+            if value is not None and value < 0:
+                logger.error(f"Option {key} with value {value} cannot be negative and set to default: None")
+                setattr(self, key, None)
+        # check columns are indices or names
+        columns = self.columns
+        if columns is not None:
+            temp: List[Union[int, str]] = []
+            for column in columns:
+                if type(column) is int and column >= 0 or type(column) is str:
+                    temp.append(column)
+                else:
+                    logger.error(f"Column {column} in option columns should be a non-negative index or a name, ignoring...")
+            self.columns = temp
+        # include is a path or glob, or a list of them
+        include = self.include
+        if not isinstance(include, str):
+            include = self.include = [str(path) for path in include]
+        # infer format from the extension of include if not given
+        if self.format is None:
+            self.format = self.format_default
+
+    @property
+    def format_default(self) -> str:
+        '''the format when not given, inferred from the extension of the (first) include, c.f. `infer_format`
+        '''
+        include = self.include
+        if not include:
+            return 'csv'
+        return infer_format(include if isinstance(include, str) else include[0]) or 'csv'
 
     def normalize(self, shape: Tuple[int, int]):
         '''normalize
@@ -288,6 +443,23 @@ class PanTableOption:
             if default:
                 self.ns_head = None
 
+    def row_slices(self) -> Optional[List[slice]]:
+        '''the selection of rows by rows, head and tail, to be applied one after another
+
+        :return: None if all rows are selected
+        '''
+        slices = []
+        rows = self.rows
+        if rows is not None:
+            slices.append(slice(*rows))
+        head = self.head
+        if head is not None:
+            slices.append(slice(head))
+        tail = self.tail
+        if tail is not None:
+            slices.append(slice(-tail, None) if tail else slice(0))
+        return slices or None
+
     @classmethod
     def from_kwargs(cls, **kwargs) -> PanTableOption:
         # TODO: PY37
@@ -325,6 +497,9 @@ class PanTableOption:
         #         dict()
         #         # special case: default factory
         #         if key == 'csv_kwargs' else
+        #         # special case: inferred
+        #         self.format_default
+        #         if key == 'format' else
         #         field_.default
         #     )
         # }
@@ -344,7 +519,7 @@ class PanTableOption:
                     for field_ in fields(self)
                 )
             )
-            if value != (dict() if key == 'csv_kwargs' else default)
+            if value != (dict() if key == 'csv_kwargs' else self.format_default if key == 'format' else default)
         }
 
     def to_spec(self, size: int) -> Spec:
@@ -455,6 +630,8 @@ class PanCodeBlock:
         '''
         dump_func = {
             'csv': dump_csv_io,
+            'parquet': dump_arrow_io,
+            'feather': dump_arrow_io,
         }
         try:
             options = PanTableOption() if options is None else options
@@ -688,13 +865,29 @@ class PanCodeBlock:
         '''
         load_func = {
             'csv': load_csv_array,
+            'parquet': load_arrow_array,
+            'feather': load_arrow_array,
+            'jsonl': load_json_array,
+            'json': load_json_array,
+            'sqlite': load_sqlite_array,
         }
         options = self.options
         # c.f. PanTable(Str|Markdown).to_str_array
         try:
-            str_array = load_func[options.format](self.data, options)
+            load = load_func[options.format]
         except KeyError:
             raise ValueError(f'Unknown format: {options.format}')
+        paths = expand_include(options.include)
+        if paths is None:
+            str_array = load(self.data, options)
+        else:
+            # all files are loaded in the same format, c.f. PanTableOption.format_default
+            str_array = load_include_files(
+                load,
+                self.data,
+                options,
+                paths,
+            )
 
         ms: Optional[np.ndarray[np.int64]]
         icas_rowblock: Optional[np.ndarray[np.str_]]
@@ -1453,19 +1646,26 @@ class PanTable(PanTableAbstract):
             attributes=self.ica_table.attributes,
         )
 
-    def to_pantablemarkdown(self) -> PanTableMarkdown:
-        '''return a PanTableMarkdown representation of self
+    def _to_pantablemarkdown_cache(self) -> Tuple[Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], ListContainer], Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[str]]]:
+        '''1st pass of to_pantablemarkdown: assemble the panflute elements to be converted
         '''
-        # * 1st pass: assemble the caches
         cache_elems: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], ListContainer] = {}
-        # for holding the value as None cases
-        cache_none: List[Union[str, Tuple[str, int, int]]] = []
+        # for holding the values known without conversion, including the None cases
+        cache_done: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[str]] = {}
+
+        def put_ica(key: Union[str, Tuple[str, int], Tuple[str, int, int]], ica: Ica):
+            text = ica.to_markdown()
+            if text is None:
+                cache_elems[key] = ica.to_panflute_ast()
+            else:
+                cache_done[key] = text
+
         # caption
         cache_elems['caption'] = self.caption
         # short_caption
         short_caption = self.short_caption
         if short_caption is None:
-            cache_none.append('short_caption')
+            cache_done['short_caption'] = None
         else:
             # iter_convert_texts_panflute_to_markdown accept ListContainer of Block only
             cache_elems['short_caption'] = ListContainer(Plain(*short_caption))
@@ -1480,35 +1680,29 @@ class PanTable(PanTableAbstract):
                 # don't repeat cell-blocks
                 if cells.is_at(i, j):
                     cache_elems[('cells', i, j)] = contents[i, j]
-                    cache_elems[('icas', i, j)] = icas[i, j].to_panflute_ast()
+                    put_ica(('icas', i, j), icas[i, j])
                 else:
-                    cache_none.append(('cells', i, j))
+                    cache_done[('cells', i, j)] = None
                     # don't need this below because checking is_at by cell only
-                    # cache_none.append(('icas', i, j))
+                    # cache_done[('icas', i, j)] = None
         # icas_row
         icas_row = self.icas_row
         for i in range(m):
-            cache_elems[('icas_row', i)] = icas_row[i].to_panflute_ast()
+            put_ica(('icas_row', i), icas_row[i])
         # icas_rowblock
         m_rowblocks = self.m_icas_rowblock
         icas_rowblock = self.icas_rowblock
         for i in range(m_rowblocks):
-            cache_elems[('icas_rowblock', i)] = icas_rowblock[i].to_panflute_ast()
+            put_ica(('icas_rowblock', i), icas_rowblock[i])
+        return cache_elems, cache_done
 
-        # * batch convert to markdown
-        # the bottle neck is calling pandoc so we batch them and call it once only
-        cache_texts: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[str]] = {
-            key: value
-            for key, value in chain(
-                zip(
-                    cache_elems.keys(),
-                    iter_convert_texts_panflute_to_markdown(cache_elems.values()),
-                ),
-                zip(cache_none, repeat(None))
-            )
-        }
-
-        # * 2nd pass: get output from cache
+    def _from_cache_texts(self, cache_texts: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[str]]) -> PanTableMarkdown:
+        '''2nd pass of to_pantablemarkdown: get output from cache
+        '''
+        m = self.m
+        n = self.n
+        cells = self.cells
+        m_rowblocks = self.m_icas_rowblock
         # cells and icas
         cells_res = TableArray.default((m, n))
         geometries = cells.geometries
@@ -1544,6 +1738,45 @@ class PanTable(PanTableAbstract):
             aligns=self.aligns,
         )
 
+    def to_pantablemarkdown(self) -> PanTableMarkdown:
+        '''return a PanTableMarkdown representation of self
+        '''
+        return self.batch_to_pantablemarkdown((self,))[0]
+
+    @staticmethod
+    def batch_to_pantablemarkdown(tables: Sequence[PanTable]) -> List[PanTableMarkdown]:
+        '''return PanTableMarkdown representations of many PanTable
+
+        This is equivalent to `[table.to_pantablemarkdown() for table in tables]`,
+        but the panflute elements from all tables are converted together,
+        except those of tables with footnotes, c.f. `convert_groups`.
+        '''
+        # * 1st pass: assemble the caches
+        caches = [table._to_pantablemarkdown_cache() for table in tables]
+        if not caches:
+            return []
+
+        # * batch convert to markdown
+        # the bottle neck is calling pandoc so we batch them and call it once only
+        texts_tables = convert_groups(
+            [list(cache_elems.values()) for cache_elems, _ in caches],
+            iter_convert_texts_panflute_to_markdown,
+            is_panflute_independent,
+        )
+
+        # * 2nd pass: get output from cache
+        res = []
+        for table, (cache_elems, cache_done), texts in zip(tables, caches, texts_tables):
+            cache_texts: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[str]] = {
+                key: value
+                for key, value in chain(
+                    zip(cache_elems.keys(), texts),
+                    cache_done.items(),
+                )
+            }
+            res.append(table._from_cache_texts(cache_texts))
+        return res
+
     def to_pantablestr(self) -> PanTableStr:
         '''return a PanTableStr representation of self
 
@@ -1603,7 +1836,7 @@ class PanTableStr(PanTableAbstract):
 
     def to_pantableoption(
         self,
-        format: str = 'csv',
+        format: Optional[str] = None,
         fancy_table: bool = False,
         include: str = '',
         csv_kwargs: Optional[dict] = None,
@@ -1636,7 +1869,7 @@ class PanTableStr(PanTableAbstract):
 
     def to_pancodeblock(
         self,
-        format: str = 'csv',
+        format: Optional[str] = None,
         include: str = '',
         csv_kwargs: Optional[dict] = None,
     ) -> PanCodeBlock:
@@ -1748,19 +1981,26 @@ class PanTableMarkdown(PanTableStr):
     '''similar to PanTableStr, but with all str assumed to be in markdown
     '''
 
-    def to_pantable(self) -> PanTable:
-        '''return a PanTable representation of self
+    def _to_pantable_cache(self) -> Tuple[Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], str], Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[Ica]]]:
+        '''1st pass of to_pantable: assemble the markdown strings to be converted
         '''
-        # * 1st pass: assemble the caches
         cache_texts: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], str] = {}
-        # for holding the value as None cases
-        cache_none: List[Union[str, Tuple[str, int, int]]] = []
+        # for holding the values known without conversion, including the None cases
+        cache_done: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[Ica]] = {}
+
+        def put_ica(key: Union[str, Tuple[str, int], Tuple[str, int, int]], text: str):
+            ica = Ica.from_markdown(text)
+            if ica is None:
+                cache_texts[key] = text
+            else:
+                cache_done[key] = ica
+
         # caption
         cache_texts['caption'] = self.caption
         # short_caption
         short_caption = self.short_caption
         if short_caption is None:
-            cache_none.append('short_caption')
+            cache_done['short_caption'] = None
         else:
             cache_texts['short_caption'] = short_caption
         # cells and icas
@@ -1774,35 +2014,32 @@ class PanTableMarkdown(PanTableStr):
                 # don't repeat cell-block
                 if cells.is_at(i, j):
                     cache_texts[('cells', i, j)] = contents[i, j]
-                    cache_texts[('icas', i, j)] = icas[i, j]
+                    put_ica(('icas', i, j), icas[i, j])
                 else:
-                    cache_none.append(('cells', i, j))
+                    cache_done[('cells', i, j)] = None
                     # don't need this below because checking is_at by cell only
-                    # cache_none.append(('icas', i, j))
+                    # cache_done[('icas', i, j)] = None
         # icas_row
         icas_row = self.icas_row
         for i in range(m):
-            cache_texts[('icas_row', i)] = icas_row[i]
+            put_ica(('icas_row', i), icas_row[i])
         # icas_rowblock
         m_rowblocks = self.m_icas_rowblock
         icas_rowblock = self.icas_rowblock
         for i in range(m_rowblocks):
-            cache_texts[('icas_rowblock', i)] = icas_rowblock[i]
+            put_ica(('icas_rowblock', i), icas_rowblock[i])
+        return cache_texts, cache_done
 
-        # * batch convert to markdown
-        # the bottle neck is calling pandoc so we batch them and call it once only
-        cache_elems: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Optional[ListContainer]] = {
-            key: value
-            for key, value in chain(
-                zip(
-                    cache_texts.keys(),
-                    iter_convert_texts_markdown_to_panflute(cache_texts.values()),
-                ),
-                zip(cache_none, repeat(None))
-            )
-        }
+    def _from_cache_elems(self, cache_elems: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Union[ListContainer, Ica, None]]) -> PanTable:
+        '''2nd pass of to_pantable: get output from cache
+        '''
+        def to_ica(value: Union[ListContainer, Ica]) -> Ica:
+            return value if type(value) is Ica else Ica.from_panflute_ast(value)
 
-        # * 2nd pass: get output from cache
+        m = self.m
+        n = self.n
+        cells = self.cells
+        m_rowblocks = self.m_icas_rowblock
         # short_caption
         temp = cache_elems['short_caption']
         short_caption_res = temp[0].content if temp else None
@@ -1819,15 +2056,15 @@ class PanTableMarkdown(PanTableStr):
                     # colliding cells to be overwritten
                     cell_shape = cells.shape_at(i, j)
                     res.put(single_para_to_plain(content), cell_shape[0], cell_shape[1], i, j, overwrite=True)
-                    icas_res[i, j] = Ica.from_panflute_ast(cache_elems[('icas', i, j)])
+                    icas_res[i, j] = to_ica(cache_elems[('icas', i, j)])
         # icas_row
         icas_row_res = np.empty(m, dtype=np.object_)
         for i in range(m):
-            icas_row_res[i] = Ica.from_panflute_ast(cache_elems[('icas_row', i)])
+            icas_row_res[i] = to_ica(cache_elems[('icas_row', i)])
         # icas_rowblock
         icas_rowblock_res = np.empty(m_rowblocks, dtype=np.object_)
         for i in range(m_rowblocks):
-            icas_rowblock_res[i] = Ica.from_panflute_ast(cache_elems[('icas_rowblock', i)])
+            icas_rowblock_res[i] = to_ica(cache_elems[('icas_rowblock', i)])
 
         return PanTable(
             res,
@@ -1843,6 +2080,45 @@ class PanTableMarkdown(PanTableStr):
             ns_head=self.ns_head,
         )
 
+    def to_pantable(self) -> PanTable:
+        '''return a PanTable representation of self
+        '''
+        return self.batch_to_pantable((self,))[0]
+
+    @staticmethod
+    def batch_to_pantable(tables: Sequence[PanTableMarkdown]) -> List[PanTable]:
+        '''return PanTable representations of many PanTableMarkdown
+
+        This is equivalent to `[table.to_pantable() for table in tables]`,
+        but the markdown from all tables are converted together,
+        except those of tables with footnotes, reference links, etc., c.f. `convert_groups`.
+        '''
+        # * 1st pass: assemble the caches
+        caches = [table._to_pantable_cache() for table in tables]
+        if not caches:
+            return []
+
+        # * batch convert to panflute AST
+        # the bottle neck is calling pandoc so we batch them and call it once only
+        elems_tables = convert_groups(
+            [list(cache_texts.values()) for cache_texts, _ in caches],
+            iter_convert_texts_markdown_to_panflute,
+            is_markdown_independent,
+        )
+
+        # * 2nd pass: get output from cache
+        res = []
+        for table, (cache_texts, cache_done), elems in zip(tables, caches, elems_tables):
+            cache_elems: Dict[Union[str, Tuple[str, int], Tuple[str, int, int]], Union[ListContainer, Ica, None]] = {
+                key: value
+                for key, value in chain(
+                    zip(cache_texts.keys(), elems),
+                    cache_done.items(),
+                )
+            }
+            res.append(table._from_cache_elems(cache_elems))
+        return res
+
     def to_str_array(self, fancy_table: bool = False) -> np.ndarray[np.str_]:
         '''construct a table with both content and ica together
         '''
@@ -1908,7 +2184,7 @@ class PanTableMarkdown(PanTableStr):
 
     def to_pancodeblock(
         self,
-        format: str = 'csv',
+        format: Optional[str] = None,
         fancy_table: bool = False,
         include: str = '',
         csv_kwargs: Optional[dict] = None,
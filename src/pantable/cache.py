@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import codecs
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = getLogger('pantable')
+
+#: values of PANTABLECACHE that disable the cache
+DISABLES = ('', '0', 'false', 'no', 'off')
+#: default of PANTABLECACHESIZE in MiB
+CACHE_SIZE_DEFAULT = 256
+
+
+def cache_dir() -> Optional[Path]:
+    '''the directory of pantable caches, or None if disabled
+
+    from env. var. `PANTABLECACHE`,
+    default to `$XDG_CACHE_HOME/pantable` or `~/.cache/pantable`.
+    '''
+    path = os.environ.get('PANTABLECACHE')
+    if path is None:
+        return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'pantable'
+    if path.strip().lower() in DISABLES:
+        return None
+    return Path(path)
+
+
+class ConversionCache:
+    '''a persistent content-addressed cache of converted fragments, with LRU eviction
+
+    :param path: path to the sqlite database
+    :param int max_size: maximum total size of the values in bytes
+    '''
+
+    def __init__(self, path: Union[str, Path], max_size: int = CACHE_SIZE_DEFAULT << 20):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=60., check_same_thread=False)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, atime REAL NOT NULL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS cache_atime ON cache (atime)')
+
+    @staticmethod
+    def key(
+        text: str,
+        input_format: str,
+        output_format: str,
+        pandoc_version: str,
+        extra_args: Optional[List[str]] = None,
+    ) -> str:
+        '''hash of everything that determines the output of a conversion
+        '''
+        h = hashlib.sha256()
+        for part in (input_format, output_format, pandoc_version, '\0'.join(extra_args or ()), text):
+            h.update(part.encode('utf-8', 'surrogatepass'))
+            h.update(b'\xff')
+        return h.hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        '''get the cached values of keys, skipping those not found
+        '''
+        keys = list(set(keys))
+        res: Dict[str, str] = {}
+        now = time.time()
+        with self._lock, self._conn:
+            # stay below SQLITE_MAX_VARIABLE_NUMBER
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                res.update(self._conn.execute(f'SELECT key, value FROM cache WHERE key IN ({placeholders})', chunk))
+                self._conn.execute(f'UPDATE cache SET atime = ? WHERE key IN ({placeholders})', [now] + chunk)
+        return res
+
+    def set_many(self, items: Dict[str, str]):
+        '''set values by keys, then evict the least recently used if oversized
+        '''
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, size, atime) VALUES (?, ?, ?, ?)',
+                ((key, value, len(value), now) for key, value in items.items()),
+            )
+            self._evict()
+
+    def _evict(self):
+        size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+        excess = size - self.max_size
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM cache ORDER BY atime'):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany('DELETE FROM cache WHERE key = ?', keys)
+        logger.debug(f'Evicted {len(keys)} entries from {self.path}.')
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM cache')
+
+
+# False means not initialized yet
+_cache: Union[ConversionCache, None, bool] = False
+
+
+def get_cache() -> Optional[ConversionCache]:
+    '''get the conversion cache, or None if disabled
+
+    initialized from env. var. `PANTABLECACHE` and `PANTABLECACHESIZE` (in MiB) on first use.
+    '''
+    global _cache
+    if _cache is False:
+        _cache = None
+        path = cache_dir()
+        if path is not None:
+            try:
+                max_size = int(os.environ.get('PANTABLECACHESIZE', CACHE_SIZE_DEFAULT))
+            except ValueError:
+                logger.error(f'Unknown PANTABLECACHESIZE {os.environ["PANTABLECACHESIZE"]}, set to default {CACHE_SIZE_DEFAULT}.')
+                max_size = CACHE_SIZE_DEFAULT
+            try:
+                _cache = ConversionCache(path / 'conversions.sqlite', max_size=max_size << 20)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f'Cannot use cache in {path}, disabled: {e}')
+    return _cache
+
+
+def set_cache(cache: Optional[ConversionCache]):
+    '''set the conversion cache, None to disable
+    '''
+    global _cache
+    _cache = cache
+
+
+class CachedTable:
+    '''a parsed table stored as the UTF-8 encoded cells, each followed by a separator
+
+    :param buffer: the UTF-8 buffer, usually memory-mapped
+    :param offsets: byte offsets of the start of each row in buffer, followed by the buffer size
+    :param lengths: the original no. of cells of each row, before padding to n
+    :param int n: no. of columns
+    :param str sep: the separator, an ASCII character not in any cell
+    '''
+
+    def __init__(
+        self,
+        buffer: np.ndarray[np.uint8],
+        offsets: np.ndarray[np.int64],
+        lengths: np.ndarray[np.int64],
+        n: int,
+        sep: str,
+    ):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.lengths = lengths
+        self.n = n
+        self.sep = sep
+
+    def rows(self, idxs: range) -> np.ndarray[np.str_]:
+        '''decode the rows in idxs only
+        '''
+        if not idxs:
+            return np.empty((0, self.n), dtype=np.object_)
+        i_min = min(idxs)
+        i_max = max(idxs) + 1
+        offsets = self.offsets
+        cells = bytes(self.buffer[offsets[i_min]:offsets[i_max]]).decode('utf-8', 'surrogatepass').split(self.sep)
+        # the last one is empty after the last separator
+        cells.pop()
+        res = np.empty(len(cells), dtype=np.object_)
+        res[:] = cells
+        res = res.reshape(-1, self.n)
+        return res if idxs.step == 1 else res[[i - i_min for i in idxs]]
+
+
+#: separators of cells in CachedTable, the first one not found in the table is used
+SEPARATORS = ('\x1f', '\x1e', '\x1d', '\x1c', '\x00')
+#: no. of rows encoded at a time when saving to the include cache
+SAVE_CHUNK_ROWS = 4096
+#: default of PANTABLEINCLUDECACHESIZE in MiB
+INCLUDE_CACHE_SIZE_DEFAULT = 1024
+
+
+def _write_buffer(f: BinaryIO, array: np.ndarray[np.str_], sep: str) -> Optional[np.ndarray[np.int64]]:
+    '''write the buffer of CachedTable to f a chunk of rows at a time, and return its offsets
+
+    :return: None if sep is in any cell
+    '''
+    m, n = array.shape
+    offsets = np.zeros(m + 1, dtype=np.int64)
+    size = 0
+    for i in range(0, m, SAVE_CHUNK_ROWS):
+        chunk = array[i:i + SAVE_CHUNK_ROWS]
+        text = sep.join(chunk.flat) + sep
+        if text.count(sep) != chunk.size:
+            return None
+        buffer = np.frombuffer(text.encode('utf-8', 'surrogatepass'), dtype=np.uint8)
+        # end of every row is after its n-th separator
+        offsets[i + 1:i + 1 + chunk.shape[0]] = np.flatnonzero(buffer == ord(sep))[n - 1::n] + (size + 1)
+        f.write(buffer.tobytes())
+        size += buffer.size
+    return offsets
+
+
+class IncludeCache:
+    '''a persistent cache of parsed include files, with LRU eviction
+
+    Each entry is keyed by the path, size, mtime, encoding and csv_kwargs of the include file,
+    and stored as a `.bin` of the UTF-8 buffer, which is memory-mapped on load,
+    and a `.npz` of the rest of CachedTable, whose mtime is updated on load.
+    Only the latest entry of each include file is kept.
+
+    :param path: the directory of the cache
+    :param int max_size: maximum total size of the entries in bytes
+    '''
+
+    #: bump this when the format of the entries changes
+    VERSION = 2
+
+    def __init__(self, path: Union[str, Path], max_size: int = INCLUDE_CACHE_SIZE_DEFAULT << 20):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+
+    def _names(
+        self,
+        include: Union[str, Path],
+        stat: os.stat_result,
+        encoding: str,
+        csv_kwargs: dict,
+    ) -> Tuple[str, str]:
+        '''prefix of the entries of include, and the name of its current entry
+        '''
+        path = os.path.realpath(include)
+        prefix = hashlib.sha256(path.encode('utf-8', 'surrogatepass')).hexdigest()[:32]
+        key = json.dumps(
+            [self.VERSION, stat.st_size, stat.st_mtime_ns, codecs.lookup(encoding).name, csv_kwargs],
+            sort_keys=True,
+            default=str,
+        )
+        return prefix, f'{prefix}-{hashlib.sha256(key.encode()).hexdigest()[:32]}'
+
+    def load(
+        self,
+        include: Union[str, Path],
+        stat: os.stat_result,
+        encoding: str,
+        csv_kwargs: dict,
+    ) -> Optional[CachedTable]:
+        _, name = self._names(include, stat, encoding, csv_kwargs)
+        path_meta = self.path / f'{name}.npz'
+        try:
+            with np.load(path_meta, allow_pickle=False) as meta:
+                offsets = meta['offsets']
+                lengths = meta['lengths']
+                n = int(meta['n'])
+                sep = str(meta['sep'])
+            buffer = np.memmap(self.path / f'{name}.bin', dtype=np.uint8, mode='r')
+            # mark as recently used
+            os.utime(path_meta)
+        except (OSError, ValueError, KeyError):
+            return None
+        return CachedTable(buffer, offsets, lengths, n, sep)
+
+    def save(
+        self,
+        include: Union[str, Path],
+        stat: os.stat_result,
+        encoding: str,
+        csv_kwargs: dict,
+        array: np.ndarray[np.str_],
+        lengths: np.ndarray[np.int64],
+    ):
+        '''save the parsed array of include, then evict the least recently used entries if oversized
+
+        The buffer is encoded a chunk of rows at a time, so it is never held in memory in full.
+        Nothing is saved if no separator can be found or the entry alone is too large.
+        '''
+        prefix, name = self._names(include, stat, encoding, csv_kwargs)
+        path = self.path
+        # remove the stale entries of this include
+        for path_old in path.glob(f'{prefix}-*'):
+            try:
+                path_old.unlink()
+            except OSError:
+                pass
+        pid = os.getpid()
+        path_buffer = path / f'{name}.bin.{pid}.tmp'
+        path_meta = path / f'{name}.npz.{pid}.tmp'
+        try:
+            try:
+                with open(path_buffer, 'wb') as f:
+                    for sep in SEPARATORS:
+                        offsets = _write_buffer(f, array, sep)
+                        if offsets is not None:
+                            break
+                        f.seek(0)
+                        f.truncate()
+                if offsets is None or offsets[-1] > self.max_size:
+                    return
+                with open(path_meta, 'wb') as f:
+                    np.savez(f, offsets=offsets, lengths=lengths, n=np.array(array.shape[1]), sep=np.array(sep))
+                # the buffer is moved last as its existence marks a complete entry
+                os.replace(path_meta, path / f'{name}.npz')
+                os.replace(path_buffer, path / f'{name}.bin')
+            finally:
+                for path_temp in (path_buffer, path_meta):
+                    try:
+                        path_temp.unlink()
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning(f'Cannot write include cache in {path}: {e}')
+            return
+        self._evict()
+
+    def _evict(self):
+        sizes: Dict[str, int] = {}
+        atimes: Dict[str, float] = {}
+        for path in self.path.iterdir():
+            # skip temporary files being written
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            name = path.name.split('.', 1)[0]
+            sizes[name] = sizes.get(name, 0) + stat.st_size
+            atimes[name] = max(atimes.get(name, 0.), stat.st_mtime)
+        excess = sum(sizes.values()) - self.max_size
+        if excess <= 0:
+            return
+        names = []
+        for name in sorted(atimes, key=atimes.__getitem__):
+            names.append(name)
+            excess -= sizes[name]
+            if excess <= 0:
+                break
+        for name in names:
+            for path in self.path.glob(f'{name}.*'):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        logger.debug(f'Evicted {len(names)} entries from {self.path}.')
+
+    def clear(self):
+        for path in self.path.iterdir():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+# False means not initialized yet
+_include_cache: Union[IncludeCache, None, bool] = False
+
+
+def get_include_cache() -> Optional[IncludeCache]:
+    '''get the include cache, or None if disabled
+
+    in the `includes` directory of :func:`cache_dir` on first use,
+    with its size from env. var. `PANTABLEINCLUDECACHESIZE` (in MiB).
+    '''
+    global _include_cache
+    if _include_cache is False:
+        _include_cache = None
+        path = cache_dir()
+        if path is not None:
+            try:
+                max_size = int(os.environ.get('PANTABLEINCLUDECACHESIZE', INCLUDE_CACHE_SIZE_DEFAULT))
+            except ValueError:
+                logger.error(f'Unknown PANTABLEINCLUDECACHESIZE {os.environ["PANTABLEINCLUDECACHESIZE"]}, set to default {INCLUDE_CACHE_SIZE_DEFAULT}.')
+                max_size = INCLUDE_CACHE_SIZE_DEFAULT
+            try:
+                _include_cache = IncludeCache(path / 'includes', max_size=max_size << 20)
+            except OSError as e:
+                logger.warning(f'Cannot use include cache in {path}, disabled: {e}')
+    return _include_cache
+
+
+def set_include_cache(cache: Optional[IncludeCache]):
+    '''set the include cache, None to disable
+    '''
+    global _include_cache
+    _include_cache = cache
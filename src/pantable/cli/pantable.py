@@ -1,14 +1,56 @@
 from __future__ import annotations
 
+from logging import getLogger
 from typing import TYPE_CHECKING
 
 from panflute.io import run_filter
 from panflute.tools import yaml_filter
 
-from ..codeblock_to_table import codeblock_to_table
+from ..codeblock_to_table import codeblock_to_table, codeblocks_to_tables, codeblocks_to_tables_parallel
 
 if TYPE_CHECKING:
-    from panflute.elements import Doc
+    from typing import Union
+
+    from panflute.elements import Doc, Element
+
+logger = getLogger('pantable')
+
+
+def prepare(doc: Doc):
+    '''read pantable settings from the document metadata
+
+    - `pantable-batch`: if true, convert the markdown from all tables
+      in a single batch. See :func:`pantable.codeblock_to_table.codeblocks_to_tables`
+    - `pantable-parallel`: if true, or the no. of processes, convert the tables
+      in a process pool. See :func:`pantable.codeblock_to_table.codeblocks_to_tables_parallel`.
+      This takes precedence over `pantable-batch`.
+    '''
+    doc.pantable_batch = bool(doc.get_metadata('pantable-batch', False))
+    parallel = str(doc.get_metadata('pantable-parallel', False)).strip().lower()
+    # False means disabled, None means the default no. of processes
+    max_workers: Union[int, bool, None] = False
+    if parallel in ('true', 'yes', 'on'):
+        max_workers = None
+    elif parallel not in ('false', 'no', 'off', ''):
+        try:
+            max_workers = max(int(parallel), 1)
+        except ValueError:
+            logger.error(f'Unknown pantable-parallel {parallel}, set to default false.')
+    doc.pantable_parallel = max_workers
+
+
+def action(elem: Element, doc: Doc):
+    # in batch or parallel mode all code-blocks are converted in finalize instead
+    if not doc.pantable_batch and doc.pantable_parallel is False:
+        return yaml_filter(elem, doc, tag="table", function=codeblock_to_table, strict_yaml=True)
+    return None
+
+
+def finalize(doc: Doc):
+    if doc.pantable_parallel is not False:
+        codeblocks_to_tables_parallel(doc, max_workers=doc.pantable_parallel)
+    elif doc.pantable_batch:
+        codeblocks_to_tables(doc)
 
 
 def main(doc: Doc | None = None):
@@ -19,11 +61,10 @@ def main(doc: Doc | None = None):
     :func:`pantable.codeblock_to_table.codeblock_to_table`
     """
     return run_filter(
-        yaml_filter,
+        action,
+        prepare=prepare,
+        finalize=finalize,
         doc=doc,
-        tag="table",
-        function=codeblock_to_table,
-        strict_yaml=True,
     )
 
 
@@ -1,13 +1,53 @@
 from __future__ import annotations
 
+import os
 from typing import TYPE_CHECKING
 
 from panflute.io import run_filter
 
-from ..table_to_codeblock import table_to_codeblock
+from ..io import get_overwrite, set_overwrite
+from ..table_to_codeblock import TableExporter, table_to_codeblock, tables_to_codeblocks
 
 if TYPE_CHECKING:
-    from panflute.elements import Doc
+    from panflute.elements import CodeBlock, Doc, Element
+
+
+def prepare(doc: Doc):
+    '''read pantable settings from the document metadata
+
+    - `pantable-batch`: if true, convert all tables to markdown
+      in a single batch. See :func:`pantable.table_to_codeblock.tables_to_codeblocks`
+    - `pantable-overwrite`: the policy of writing to existing include files,
+      overriding env. var. `PANTABLEOVERWRITE`. See :func:`pantable.io.set_overwrite`
+    - `pantable-export-dir`: if set, export the data of each table to a CSV file in this directory,
+      with a manifest. Existing files in it are overwritten if changed,
+      unless `pantable-overwrite` or env. var. `PANTABLEOVERWRITE` is set.
+      See :class:`pantable.table_to_codeblock.TableExporter`
+    '''
+    doc.pantable_batch = bool(doc.get_metadata('pantable-batch', False))
+    overwrite = doc.get_metadata('pantable-overwrite', None)
+    if overwrite is not None:
+        set_overwrite(str(overwrite))
+    export_dir = doc.get_metadata('pantable-export-dir', '')
+    doc.pantable_exporter = TableExporter(
+        str(export_dir),
+        overwrite='changed' if overwrite is None and 'PANTABLEOVERWRITE' not in os.environ else get_overwrite(),
+    ) if export_dir else None
+
+
+def action(elem: Element, doc: Doc, **kwargs) -> CodeBlock | None:
+    # in batch mode all tables are converted in finalize instead
+    if not doc.pantable_batch:
+        return table_to_codeblock(elem, doc, exporter=doc.pantable_exporter, **kwargs)
+    return None
+
+
+def finalize(doc: Doc, **kwargs):
+    exporter = doc.pantable_exporter
+    if doc.pantable_batch:
+        tables_to_codeblocks(doc, exporter=exporter, **kwargs)
+    if exporter is not None:
+        exporter.close()
 
 
 def main(doc: Doc | None = None):
@@ -17,7 +57,7 @@ def main(doc: Doc | None = None):
     - metadata in YAML
     - table in CSV
     """
-    return run_filter(table_to_codeblock, doc=doc)
+    return run_filter(action, prepare=prepare, finalize=finalize, doc=doc)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+from functools import partial
 from typing import TYPE_CHECKING
 
 from panflute.io import run_filter
 
-from ..table_to_codeblock import table_to_codeblock
+from .pantable2csv import action, finalize, prepare
 
 if TYPE_CHECKING:
     from panflute.elements import Doc
@@ -17,7 +18,7 @@ def main(doc: Doc | None = None):
     - metadata in YAML
     - table in CSV
     """
-    return run_filter(table_to_codeblock, doc=doc, fancy_table=True)
+    return run_filter(action, prepare=prepare, finalize=partial(finalize, fancy_table=True), doc=doc, fancy_table=True)
 
 
 if __name__ == "__main__":
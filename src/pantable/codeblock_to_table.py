@@ -1,26 +1,39 @@
 from __future__ import annotations
 
+import json
+from concurrent.futures import ProcessPoolExecutor
 from logging import getLogger
 from typing import TYPE_CHECKING
 
-from .ast import PanCodeBlock
+from panflute.elements import CodeBlock, from_json
+from panflute.tools import yaml_filter
+
+from .ast import PanCodeBlock, PanTableMarkdown, PanTableStr
+from .converter import set_converter
 from .util import EmptyTableError
 
 if TYPE_CHECKING:
-    from typing import Optional, Union
+    from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
-    from panflute.elements import CodeBlock, Doc
+    from panflute.elements import Doc, Element
     from panflute.table_elements import Table
 
+    from .ast import PanTable
+
 logger = getLogger('pantable')
 
 
-def codeblock_to_table(
+def codeblock_to_pantablestr(
     options: Optional[dict] = None,
     data: str = '',
     element: Optional[CodeBlock] = None,
     doc: Optional[Doc] = None,
-) -> Union[Table, list, None]:
+) -> Union[PanTableStr, list, None]:
+    '''parse the code-block into a PanTableStr
+
+    returns `[]` if the table should be deleted and
+    `None` if the code-block should be left unchanged instead.
+    '''
     try:
         pan_table_str = (
             PanCodeBlock
@@ -29,11 +42,7 @@ def codeblock_to_table(
         )
         if pan_table_str.table_width is not None:
             pan_table_str.auto_width()
-        return (
-            pan_table_str
-            .to_pantable()
-            .to_panflute_ast()
-        )
+        return pan_table_str
     # delete element if table is empty (by returning [])
     # element unchanged if include is invalid (by returning None)
     except FileNotFoundError as e:
@@ -46,3 +55,144 @@ def codeblock_to_table(
     except ImportError as e:
         logger.error(f'Some modules cannot be imported, Codeblock shown as is: {e}')
         return None
+    # invalid options or data of the format
+    except ValueError as e:
+        logger.error(f'{e} Codeblock shown as is.')
+        return None
+
+
+def codeblock_to_table(
+    options: Optional[dict] = None,
+    data: str = '',
+    element: Optional[CodeBlock] = None,
+    doc: Optional[Doc] = None,
+) -> Union[Table, list, None]:
+    pan_table_str = codeblock_to_pantablestr(options=options, data=data, element=element, doc=doc)
+    if not isinstance(pan_table_str, PanTableStr):
+        return pan_table_str
+    return (
+        pan_table_str
+        .to_pantable()
+        .to_panflute_ast()
+    )
+
+
+def _collect_codeblocks(doc: Doc, function: Callable[..., Any]) -> Tuple[List[CodeBlock], list]:
+    '''collect the code-blocks of class table in doc, with the result of `function` on each, c.f. `yaml_filter`
+    '''
+    elements: List[CodeBlock] = []
+    results: list = []
+
+    def collect(
+        options: Optional[dict] = None,
+        data: str = '',
+        element: Optional[CodeBlock] = None,
+        doc: Optional[Doc] = None,
+    ):
+        elements.append(element)
+        results.append(function(options=options, data=data, element=element, doc=doc))
+
+    def action(elem: Element, doc: Doc):
+        yaml_filter(elem, doc, tag='table', function=collect, strict_yaml=True)
+
+    doc.walk(action)
+    return elements, results
+
+
+def _replace_codeblocks(
+    doc: Doc,
+    elements: List[CodeBlock],
+    results: list,
+    to_panflute_ast: Callable[[Any], Table],
+) -> Doc:
+    '''replace each of elements in doc by `to_panflute_ast` of its result
+
+    a result of `None` or a list is returned as is instead, c.f. `codeblock_to_pantablestr`.
+    '''
+    # the elements are kept alive in elements so their ids are unique
+    replacements: Dict[int, Any] = {id(element): res for element, res in zip(elements, results)}
+
+    def action(elem: Element, doc: Doc) -> Union[Table, list, None]:
+        try:
+            res = replacements[id(elem)]
+        except KeyError:
+            return None
+        return res if res is None or type(res) is list else to_panflute_ast(res)
+
+    return doc.walk(action)
+
+
+def codeblocks_to_tables(doc: Doc) -> Doc:
+    '''convert all code-blocks of class table in doc to Table
+
+    This has the same result as walking `codeblock_to_table` through the doc,
+    but in two phases: all code-blocks are parsed first,
+    then markdown from all tables are converted together in one batch.
+    So pandoc is called once per document rather than once per table,
+    apart from tables with footnotes, reference links, etc., c.f. `PanTableMarkdown.batch_to_pantable`.
+    '''
+    elements, pan_table_strs = _collect_codeblocks(doc, codeblock_to_pantablestr)
+
+    # * batch convert markdown tables
+    pan_tables = iter(PanTableMarkdown.batch_to_pantable(
+        [pan_table_str for pan_table_str in pan_table_strs if isinstance(pan_table_str, PanTableMarkdown)]
+    ))
+    results: List[Union[PanTable, list, None]] = []
+    for pan_table_str in pan_table_strs:
+        if isinstance(pan_table_str, PanTableMarkdown):
+            results.append(next(pan_tables))
+        elif isinstance(pan_table_str, PanTableStr):
+            results.append(pan_table_str.to_pantable())
+        else:
+            results.append(pan_table_str)
+
+    return _replace_codeblocks(doc, elements, results, lambda pan_table: pan_table.to_panflute_ast())
+
+
+def _init_worker():
+    '''use a pandoc subprocess per conversion in a worker process
+
+    A pandoc server started in a worker would never be terminated,
+    as atexit handlers are not run in the workers of a process pool.
+    '''
+    set_converter('subprocess')
+
+
+def _codeblock_to_table_json(
+    options: Optional[dict],
+    data: str,
+    ica: Tuple[str, List[str], Dict[str, str]],
+) -> Union[str, list, None]:
+    '''`codeblock_to_table` in a worker process, with the Table returned as JSON
+
+    :param ica: the identifier, classes and attributes of the code-block
+    '''
+    identifier, classes, attributes = ica
+    element = CodeBlock('', identifier=identifier, classes=classes, attributes=attributes)
+    res = codeblock_to_table(options=options, data=data, element=element)
+    return res if res is None or type(res) is list else json.dumps(res.to_json())
+
+
+def codeblocks_to_tables_parallel(doc: Doc, max_workers: Optional[int] = None) -> Doc:
+    '''convert all code-blocks of class table in doc to Table in parallel
+
+    This has the same result as walking `codeblock_to_table` through the doc,
+    but the code-blocks are converted concurrently in a process pool,
+    from loading the data to calling pandoc, and the resulting Tables are put back in document order.
+    The workers always run a pandoc subprocess per conversion, c.f. `_init_worker`.
+
+    :param max_workers: of the process pool, default to the no. of CPUs
+    '''
+    elements, args = _collect_codeblocks(
+        doc,
+        lambda options, data, element, doc: (options, data, (element.identifier, list(element.classes), dict(element.attributes))),
+    )
+
+    # not worth starting processes
+    if len(args) < 2 or max_workers == 1:
+        res = [_codeblock_to_table_json(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            res = list(executor.map(_codeblock_to_table_json, *zip(*args)))
+
+    return _replace_codeblocks(doc, elements, res, lambda table: json.loads(table, object_hook=from_json))
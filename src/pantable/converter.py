@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import atexit
+import io
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from http.client import HTTPConnection, HTTPException
+from logging import getLogger
+from subprocess import DEVNULL, Popen
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from panflute.elements import Doc, Element, from_json
+from panflute.io import dump
+from panflute.tools import inner_convert_text, pandoc_version
+
+from . import PY37
+
+if PY37:
+    from backports.cached_property import cached_property
+else:
+    from functools import cached_property
+
+if TYPE_CHECKING:
+    from typing import List, Optional, Tuple, Union
+
+logger = getLogger('pantable')
+
+
+class Converter:
+    '''a pandoc converter
+
+    it has the same interface as `panflute.tools.convert_text`.
+    Subclasses should implement `convert_raw`, which converts text between pandoc formats
+    (i.e. without panflute).
+    '''
+
+    def convert_raw(
+        self,
+        text: str,
+        input_format: str,
+        output_format: str,
+        extra_args: List[str],
+    ) -> str:
+        raise NotImplementedError
+
+    @cached_property
+    def version(self) -> str:
+        '''pandoc version
+
+        pandoc sets the env. var. `PANDOC_VERSION` when running filters,
+        so this doesn't need to call pandoc in that case.
+        '''
+        try:
+            return os.environ['PANDOC_VERSION']
+        except KeyError:
+            return '.'.join(map(str, pandoc_version.version))
+
+    @cached_property
+    def api_version(self) -> Tuple[int, ...]:
+        '''pandoc API version, obtained once per converter
+        '''
+        return tuple(json.loads(self.convert_raw('', 'markdown', 'json', ['--standalone']))['pandoc-api-version'])
+
+    def convert_text(
+        self,
+        text: Union[str, Element, List[Element]],
+        input_format: str = 'markdown',
+        output_format: str = 'panflute',
+        standalone: bool = False,
+        extra_args: Optional[List[str]] = None,
+    ):
+        '''c.f. `panflute.tools.convert_text`
+        '''
+        if input_format == 'panflute':
+            if not isinstance(text, Doc):
+                if isinstance(text, Element):
+                    text = [text]
+                text = Doc(*text, api_version=self.api_version)
+            with io.StringIO() as f:
+                dump(text, f)
+                text = f.getvalue()
+
+        in_fmt = 'json' if input_format == 'panflute' else input_format
+        out_fmt = 'json' if output_format == 'panflute' else output_format
+
+        # don't mutate extra_args
+        extra_args = [] if extra_args is None else list(extra_args)
+        if standalone:
+            extra_args.append('--standalone')
+
+        out = self.convert_raw(text, in_fmt, out_fmt, extra_args)
+
+        if output_format == 'panflute':
+            out = json.loads(out, object_hook=from_json)
+            if not standalone:
+                out = out.content.list
+        return out
+
+
+class SubprocessConverter(Converter):
+    '''run a pandoc subprocess per conversion
+    '''
+
+    def convert_raw(
+        self,
+        text: str,
+        input_format: str,
+        output_format: str,
+        extra_args: List[str],
+    ) -> str:
+        return inner_convert_text(text, input_format, output_format, extra_args)
+
+
+class ServerConverter(Converter):
+    '''convert via the HTTP API of `pandoc server`
+
+    :param str url: URL of a running pandoc server. If empty, a local `pandoc server` is started
+        and terminated at exit.
+    :param float timeout: seconds to wait for the server to be ready
+    '''
+
+    def __init__(self, url: str = '', timeout: float = 10.):
+        self.process: Optional[Popen] = None
+        if not url:
+            url = self._start()
+        parsed = urlsplit(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 3030
+        self._local = threading.local()
+        self._wait(timeout)
+
+    def _start(self) -> str:
+        pandoc_path = shutil.which('pandoc')
+        if pandoc_path is None:
+            raise OSError("Path to pandoc executable does not exists")
+        # find a free port
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        self.process = Popen([pandoc_path, 'server', '--port', str(port)], stdin=DEVNULL, stdout=DEVNULL, stderr=DEVNULL)
+        atexit.register(self.close)
+        return f'http://127.0.0.1:{port}'
+
+    def _wait(self, timeout: float):
+        '''wait until the server responds
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.process is not None and self.process.poll() is not None:
+                raise OSError(f'pandoc server exited with code {self.process.returncode}.')
+            try:
+                self._request('GET', '/version')
+                return
+            except (OSError, HTTPException, ValueError) as e:
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise OSError(f'pandoc server at {self.host}:{self.port} is not responding: {e}')
+                time.sleep(0.05)
+
+    def close(self):
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            process.wait()
+        self.process = None
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> bytes:
+        # one keep-alive connection per thread
+        conn: Optional[HTTPConnection] = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = HTTPConnection(self.host, self.port)
+        headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        # the server is reachable, so this is specific to the request
+        if response.status != 200:
+            raise ValueError(f'pandoc server error {response.status}: {data.decode("utf-8", "replace")}')
+        return data
+
+    @cached_property
+    def version(self) -> str:
+        return self._request('GET', '/version').decode('utf-8').strip().strip('"')
+
+    @staticmethod
+    def _parse_value(value: str) -> Union[str, int, float, bool]:
+        '''the JSON value of a command line value, e.g. `80` to `80` and `true` to `True`
+        '''
+        lower = value.lower()
+        if lower in ('true', 'false'):
+            return lower == 'true'
+        for type_ in (int, float):
+            try:
+                return type_(value)
+            except ValueError:
+                pass
+        return value
+
+    @classmethod
+    def _parse_args(cls, extra_args: List[str]) -> dict:
+        '''translate pandoc command line options to the options of pandoc server
+
+        e.g. `--reference-location=block` to `{'reference-location': 'block'}`
+        and `--columns=80` to `{'columns': 80}`
+        '''
+        options = {}
+        for arg in extra_args:
+            if not arg.startswith('--'):
+                raise ValueError(f'Unsupported pandoc argument for pandoc server: {arg}')
+            key, sep, value = arg[2:].partition('=')
+            options[key] = cls._parse_value(value) if sep else True
+        return options
+
+    def convert_raw(
+        self,
+        text: str,
+        input_format: str,
+        output_format: str,
+        extra_args: List[str],
+    ) -> str:
+        options = self._parse_args(extra_args)
+        options.update({'text': text, 'from': input_format, 'to': output_format})
+        res = json.loads(self._request('POST', '/', json.dumps(options).encode('utf-8')))
+        for message in res.get('messages', ()):
+            logger.debug(f'pandoc server: {message}')
+        # Replace \r\n with \n, c.f. panflute.tools.inner_convert_text
+        return '\n'.join(res['output'].splitlines())
+
+
+class FallbackConverter(Converter):
+    '''use converter until it fails, then switch to fallback permanently
+    '''
+
+    def __init__(self, converter: Converter, fallback: Converter):
+        self.converter: Optional[Converter] = converter
+        self.fallback = fallback
+
+    @cached_property
+    def version(self) -> str:
+        return self.fallback.version
+
+    def convert_raw(
+        self,
+        text: str,
+        input_format: str,
+        output_format: str,
+        extra_args: List[str],
+    ) -> str:
+        converter = self.converter
+        if converter is not None:
+            try:
+                return converter.convert_raw(text, input_format, output_format, extra_args)
+            # unsupported args or rejected by the server, fallback for this conversion only
+            except (ValueError, KeyError) as e:
+                logger.debug(e)
+            # cannot connect, fallback permanently
+            except (OSError, HTTPException) as e:
+                logger.warning(f'Converter {type(converter).__name__} failed, falling back to {type(self.fallback).__name__}: {e}')
+                self.converter = None
+                if isinstance(converter, ServerConverter):
+                    converter.close()
+        return self.fallback.convert_raw(text, input_format, output_format, extra_args)
+
+
+_converter: Optional[Converter] = None
+
+
+def create_converter(name: str = 'subprocess') -> Converter:
+    '''create a converter by name
+
+    :param str name: one of
+
+        - `subprocess`: run a pandoc subprocess per conversion.
+        - `server`: start a `pandoc server` (pandoc 3+) once and keep it warm,
+          falling back to `subprocess` if it fails.
+        - an URL of an already running pandoc server, such as `http://localhost:3030`.
+    '''
+    name = name.strip()
+    if name in ('', 'subprocess'):
+        return SubprocessConverter()
+    if name == 'server' or name.startswith('http://'):
+        try:
+            server = ServerConverter(url='' if name == 'server' else name)
+        except OSError as e:
+            logger.warning(f'Cannot use pandoc server, falling back to subprocess: {e}')
+            return SubprocessConverter()
+        return FallbackConverter(server, SubprocessConverter())
+    logger.error(f'Unknown PANTABLECONVERTER {name}, set to default subprocess.')
+    return SubprocessConverter()
+
+
+def get_converter() -> Converter:
+    '''get the current converter, created from env. var. `PANTABLECONVERTER` on first use
+    '''
+    global _converter
+    if _converter is None:
+        _converter = create_converter(os.environ.get('PANTABLECONVERTER', 'subprocess'))
+    return _converter
+
+
+def set_converter(converter: Union[Converter, str]):
+    '''set the converter used by pantable
+
+    :param converter: a Converter or its name, c.f. `create_converter`
+    '''
+    global _converter
+    _converter = create_converter(converter) if isinstance(converter, str) else converter
+
+
+def convert_text(
+    text: Union[str, Element, List[Element]],
+    input_format: str = 'markdown',
+    output_format: str = 'panflute',
+    standalone: bool = False,
+    extra_args: Optional[List[str]] = None,
+):
+    '''convert text using the current converter
+
+    c.f. `panflute.tools.convert_text`
+    '''
+    return get_converter().convert_text(
+        text,
+        input_format=input_format,
+        output_format=output_format,
+        standalone=standalone,
+        extra_args=extra_args,
+    )
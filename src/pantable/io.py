@@ -1,30 +1,161 @@
 from __future__ import annotations
 
+import bz2
+import codecs
 import csv
+import glob
+import gzip
+import hashlib
 import io
+import json
+import locale
+import lzma
+import mmap
+import os
+import re
+import shutil
+import sqlite3
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import replace
+from functools import partial
+from itertools import chain, islice
 from logging import getLogger
+from operator import methodcaller
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import numpy as np
 
+from .cache import CachedTable, get_include_cache
 from .util import EmptyTableError
 
 if TYPE_CHECKING:
-    from typing import List
+    from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
     from .ast import PanTableOption
 
 logger = getLogger('pantable')
 
+#: include files of at least this size in bytes are memory-mapped, c.f. `iter_lines_mmap`
+MMAP_THRESHOLD = 64 << 20
+#: size in bytes of the chunks decoded at a time from memory-mapped files
+CHUNK_SIZE = 1 << 20
 
-def load_csv(
+_line_pat = re.compile(r'[^\r\n]*(?:\r\n|\r|\n)')
+_line_bytes_pat = re.compile(rb'[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+')
+
+# a no. of rows larger than any table, for composing slices
+_UNBOUNDED = 1 << 62
+
+#: suffix of the sidecar row index of include files, c.f. `load_row_offsets`
+INDEX_SUFFIX = '.pantable-index.npz'
+
+
+#: compressions of include files, by the pattern of the header and the extensions they are detected from
+COMPRESSIONS = {
+    'gzip': (re.compile(rb'\x1f\x8b'), ('.gz', '.gzip')),
+    # block size, then the magic of a block or of the end of an empty stream
+    'bz2': (re.compile(rb'BZh[1-9](?:1AY&SY|\x17rE8P\x90)'), ('.bz2',)),
+    'xz': (re.compile(rb'\xfd7zXZ\x00'), ('.xz',)),
+    'zstd': (re.compile(rb'\x28\xb5\x2f\xfd'), ('.zst', '.zstd')),
+}
+
+
+def detect_compression(path: Union[str, Path], magic: bool = True) -> Optional[str]:
+    '''detect the compression of path by its extension, or else its header
+
+    :param magic: if False, detect by extension only, e.g. for a path to be written
+
+    Note that this can emit FileNotFoundError if magic
+    '''
+    suffix = os.path.splitext(path)[1].lower()
+    for compression, (_, suffixes) in COMPRESSIONS.items():
+        if suffix in suffixes:
+            return compression
+    if magic:
+        with open(path, 'rb') as f:
+            head = f.read(10)
+        for compression, (pat, _) in COMPRESSIONS.items():
+            if pat.match(head):
+                return compression
+    return None
+
+
+def open_compressed(
+    file,
+    compression: str,
+    mode: str,
+    encoding: Optional[str] = None,
+) -> io.IOBase:
+    '''open a path or binary file object with compression in text mode, without newline translation
+
+    or in binary mode if `'b'` in mode.
+    gzip headers written to file objects have no file name nor modification time,
+    so the output depends on the content only.
+
+    Note that this can emit ImportError for zstd
+    '''
+    text_kwargs = {} if 'b' in mode else {'encoding': encoding, 'newline': ''}
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('Compression zstd requires zstandard, please run "pip install zstandard".')
+        return zstandard.open(file, mode, **text_kwargs)
+    if compression == 'gzip' and not isinstance(file, (str, bytes, os.PathLike)):
+        binary = gzip.GzipFile(filename='', mode=mode.replace('t', ''), fileobj=file, mtime=0)
+        return binary if 'b' in mode else io.TextIOWrapper(binary, **text_kwargs)
+    opener = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}[compression]
+    return opener(file, mode, **text_kwargs)
+
+
+def iter_lines_mmap(
+    path: Union[str, Path],
+    encoding: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[str]:
+    '''iterate lines of a file as `open(path, encoding=encoding, newline='')` does
+
+    The file is memory-mapped and decoded chunk by chunk,
+    so memory use is bounded by the chunk size.
+    '''
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            rest = ''
+            for start in range(0, size, chunk_size):
+                final = start + chunk_size >= size
+                text = rest + decoder.decode(mm[start:start + chunk_size], final=final)
+                if final:
+                    cut = max(text.rfind('\n'), text.rfind('\r')) + 1
+                else:
+                    # a trailing \r may be followed by \n in the next chunk
+                    cut = max(text.rfind('\n'), text.rfind('\r', 0, len(text) - 1)) + 1
+                yield from _line_pat.findall(text, 0, cut)
+                rest = text[cut:]
+            if rest:
+                yield rest
+
+
+@contextmanager
+def open_csv(
     data: str,
     options: PanTableOption,
-) -> List[List[str]]:
-    '''loading CSV table
+) -> Iterator[Iterable[str]]:
+    '''open the include file, or data if include is not set, for csv.reader
 
-    Note that this can emit EmptyTableError, FileNotFoundError
+    compressed include files are decompressed while reading, c.f. `detect_compression`.
+    Otherwise, include files larger than `MMAP_THRESHOLD` are memory-mapped and read in chunks.
+
+    Note that this can emit FileNotFoundError
     '''
     include = options.include
     # TODO: PY37
@@ -35,39 +166,608 @@ def load_csv(
     if not encoding:
         encoding = None
     try:
+        compression = detect_compression(include) if include else None
+        if compression is not None:
+            with open_compressed(include, compression, 'rt', encoding=encoding) as f:
+                yield f
+            return
+        if include and os.stat(include).st_size >= MMAP_THRESHOLD:
+            lines = iter_lines_mmap(include, encoding=encoding)
+            try:
+                yield lines
+            finally:
+                lines.close()
+            return
         with (
             open(include, encoding=encoding, newline='')
         ) if include else (
             io.StringIO(data, newline='')
         ) as f:
-            table_list = list(csv.reader(f, **options.csv_kwargs))
-        if table_list:
-            for row in table_list:
-                if row:
-                    for i in row:
-                        if i.strip():
-                            return table_list
+            yield f
+    except FileNotFoundError:
+        raise FileNotFoundError(f'include path {include} not found.')
+
+
+def load_csv(
+    data: str,
+    options: PanTableOption,
+) -> List[List[str]]:
+    '''loading CSV table
+
+    Note that this can emit EmptyTableError, FileNotFoundError
+    '''
+    with open_csv(data, options) as f:
+        table_list = list(csv.reader(f, **options.csv_kwargs))
+    if table_list:
+        for row in table_list:
+            if row:
+                for i in row:
+                    if i.strip():
+                        return table_list
+    raise EmptyTableError
+
+
+def rows_to_array(
+    rows: Iterable[List[str]],
+    m_init: int = 64,
+    n_init: int = 8,
+) -> np.ndarray[np.str_]:
+    '''stream rows into a 2D object array in a single pass
+
+    The buffer is pre-filled with empty strings and grows geometrically,
+    so ragged rows are padded without touching the missing cells.
+
+    :param m_init: initial no. of rows of the buffer
+    :param n_init: initial no. of columns of the buffer
+
+    Note that this can emit EmptyTableError
+    '''
+    buffer = np.full((m_init, n_init), '', dtype=np.object_)
+    m_cap, n_cap = buffer.shape
+    m = 0
+    n = 0
+    is_empty = True
+    for row in rows:
+        n_row = len(row)
+        if m == m_cap or n_row > n_cap:
+            m_cap = 2 * m_cap if m == m_cap else m_cap
+            n_cap = max(2 * n_cap, n_row) if n_row > n_cap else n_cap
+            temp = np.full((m_cap, n_cap), '', dtype=np.object_)
+            temp[:m, :n] = buffer[:m, :n]
+            buffer = temp
+        if n_row:
+            buffer[m, :n_row] = row
+            if n_row > n:
+                n = n_row
+            if is_empty:
+                for cell in row:
+                    if cell.strip():
+                        is_empty = False
+                        break
+        m += 1
+    if is_empty:
+        raise EmptyTableError
+    return buffer[:m, :n]
+
+
+def _simple_dialect(csv_kwargs: dict) -> Optional[csv.Dialect]:
+    '''the dialect of csv_kwargs if fields are only split by the delimiter, barring quotes
+
+    i.e. without escapechar, skipinitialspace, or conversion to float.
+    '''
+    try:
+        dialect = csv.reader((), **csv_kwargs).dialect
+    except (TypeError, csv.Error):
+        return None
+    if dialect.escapechar is not None or dialect.skipinitialspace or dialect.quoting not in (csv.QUOTE_MINIMAL, csv.QUOTE_ALL, csv.QUOTE_NONE):
+        return None
+    return dialect
+
+
+def split_csv(text: str, csv_kwargs: dict) -> Optional[Tuple[np.ndarray[np.str_], np.ndarray[np.int64]]]:
+    '''parse CSV text of a simple dialect by splitting the whole buffer, c.f. `csv.reader`
+
+    If all rows have the same no. of cells, they are split by a single `str.split`
+    and reshaped to the array without touching each row.
+
+    returns the array and the no. of cells of each row,
+    or None to fall back to csv.reader if the dialect is not simple,
+    or the text has quote characters (unless QUOTE_NONE) or NUL.
+
+    Note that this can emit EmptyTableError
+    '''
+    dialect = _simple_dialect(csv_kwargs)
+    if dialect is None or '\0' in text or dialect.quoting != csv.QUOTE_NONE and dialect.quotechar in text:
+        return None
+    delimiter = dialect.delimiter
+    # line terminators of csv.reader with newline=''
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    if not lines[-1]:
+        lines.pop()
+    m = len(lines)
+    lengths = np.fromiter(map(methodcaller('count', delimiter), lines), dtype=np.int64, count=m) + 1
+    # empty lines are empty rows
+    lengths[np.fromiter(map(len, lines), dtype=np.int64, count=m) == 0] = 0
+    n = int(lengths.max()) if m else 0
+    if n == 0:
+        raise EmptyTableError
+    if (lengths == n).all():
+        res = np.empty(m * n, dtype=np.object_)
+        res[:] = delimiter.join(lines).split(delimiter)
+        res = res.reshape(m, n)
+    else:
+        res = np.full((m, n), '', dtype=np.object_)
+        for i, line in enumerate(lines):
+            if line:
+                row = line.split(delimiter)
+                res[i, :len(row)] = row
+    for cell in res.flat:
+        if cell.strip():
+            return res, lengths
+    raise EmptyTableError
+
+
+def parse_csv(f: Iterable[str], csv_kwargs: dict) -> Tuple[np.ndarray[np.str_], np.ndarray[np.int64]]:
+    '''parse CSV in full into an array, and the no. of cells of each row
+
+    Inline data and plain files, c.f. `open_csv`, are read at once and parsed by `split_csv` if possible.
+    Otherwise, such as compressed or memory-mapped files, they are streamed through csv.reader as lines,
+    so that the memory is bounded by the array.
+
+    Note that this can emit EmptyTableError
+    '''
+    # plain files are opened with a buffered reader, but decompressed streams are not
+    if isinstance(f, io.StringIO) or isinstance(f, io.TextIOWrapper) and isinstance(f.buffer, io.BufferedReader):
+        text = f.read()
+        res = split_csv(text, csv_kwargs)
+        if res is not None:
+            return res
+        f = io.StringIO(text, newline='')
+
+    lengths = array('q')
+
+    def iter_rows(rows: Iterable[List[str]]) -> Iterator[List[str]]:
+        for row in rows:
+            lengths.append(len(row))
+            yield row
+
+    res = rows_to_array(iter_rows(csv.reader(f, **csv_kwargs)))
+    return res, np.frombuffer(lengths, dtype=np.int64)
+
+
+def _is_ascii_compatible(encoding: str) -> bool:
+    '''check if the bytes of CSV syntax and newlines are the same in encoding as in ASCII
+    '''
+    encoder = codecs.getincrementalencoder(encoding)()
+    # the 1st encode absorbs BOM if any
+    encoder.encode('a')
+    return encoder.encode(',;\t|"\'\r\n') == b',;\t|"\'\r\n'
+
+
+def _iter_lines_offset(
+    mm: mmap.mmap,
+    encoding: str,
+    start: int = 0,
+    end: Optional[int] = None,
+    offset: Optional[List[int]] = None,
+) -> Iterator[str]:
+    '''iterate decoded lines from mm[start:end]
+
+    :param offset: if given, offset[0] is updated to the end of the last yielded line
+    '''
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for match in _line_bytes_pat.finditer(mm, start, len(mm) if end is None else end):
+        if offset is not None:
+            offset[0] = match.end()
+        yield decoder.decode(match[0])
+
+
+def build_row_offsets(
+    path: Union[str, Path],
+    encoding: Optional[str] = None,
+    csv_kwargs: Optional[dict] = None,
+) -> np.ndarray[np.int64]:
+    '''byte offsets of the start of each row of a CSV file, followed by the file size
+
+    Rows are determined by `csv.reader`, so quoted newlines are handled.
+    The encoding must be ASCII compatible.
+    '''
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    if csv_kwargs is None:
+        csv_kwargs = {}
+    offsets = array('q')
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = [0]
+                # csv.reader does not read ahead, so a row starts where the last row ends
+                start = 0
+                for _ in csv.reader(_iter_lines_offset(mm, encoding, offset=offset), **csv_kwargs):
+                    offsets.append(start)
+                    start = offset[0]
+        offsets.append(size)
+    return np.frombuffer(offsets, dtype=np.int64)
+
+
+def load_row_offsets(
+    path: Union[str, Path],
+    encoding: Optional[str] = None,
+    csv_kwargs: Optional[dict] = None,
+) -> Optional[np.ndarray[np.int64]]:
+    '''load the row offsets of an include file from its sidecar index, c.f. `build_row_offsets`
+
+    The index is at `path` + `INDEX_SUFFIX`, (re)built if it does not match the size and mtime of the file,
+    the encoding or csv_kwargs.
+
+    :return: None if the encoding is not supported
+    '''
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    if not _is_ascii_compatible(encoding):
+        logger.warning(f'Row index is not supported for encoding {encoding}, ignoring...')
+        return None
+    stat = os.stat(path)
+    key = json.dumps([stat.st_size, stat.st_mtime_ns, codecs.lookup(encoding).name, csv_kwargs or {}], sort_keys=True, default=str)
+    path_index = Path(f'{path}{INDEX_SUFFIX}')
+    try:
+        with np.load(path_index, allow_pickle=False) as index:
+            if str(index['key']) == key:
+                return index['offsets']
+    except (OSError, ValueError, KeyError):
+        pass
+    offsets = build_row_offsets(path, encoding=encoding, csv_kwargs=csv_kwargs)
+    path_temp = path_index.with_name(f'{path_index.name}.{os.getpid()}.tmp')
+    try:
+        with open(path_temp, 'wb') as f:
+            np.savez(f, offsets=offsets, key=np.array(key))
+        os.replace(path_temp, path_index)
+    except OSError as e:
+        logger.warning(f'Cannot write row index {path_index}: {e}')
+        try:
+            os.remove(path_temp)
+        except OSError:
+            pass
+    return offsets
+
+
+def _select(slices: Sequence[slice], size: int, start: int = 0) -> range:
+    '''apply slices one after another on the indices range(start, size)
+    '''
+    idxs = range(start, size)
+    for slice_ in slices:
+        idxs = idxs[slice_]
+    return idxs
+
+
+def _as_slice(slices: Sequence[slice]) -> Optional[slice]:
+    '''compose slices into one that `itertools.islice` can take
+
+    :return: None if the result depends on the no. of rows, e.g. negative indices
+    '''
+    for slice_ in slices:
+        if (slice_.start or 0) < 0 or (slice_.stop or 0) < 0 or (slice_.step or 1) < 0:
+            return None
+    idxs = _select(slices, _UNBOUNDED)
+    return slice(idxs.start, None if idxs.stop > _UNBOUNDED >> 1 else idxs.stop, idxs.step)
+
+
+def _iter_rows_selected(rows: Iterator[List[str]], slices: Sequence[slice]) -> Iterable[List[str]]:
+    '''select rows by slices, streaming whenever possible
+    '''
+    slice_ = _as_slice(slices)
+    if slice_ is not None:
+        return islice(rows, slice_.start, slice_.stop, slice_.step)
+    # only the last rows are needed
+    if len(slices) == 1 and slices[0].stop is None and (slices[0].step or 1) == 1:
+        return deque(rows, maxlen=-slices[0].start)
+    rows_all = list(rows)
+    return [rows_all[i] for i in _select(slices, len(rows_all))]
+
+
+def _resolve_columns(columns: List[Union[int, str]], first: Optional[List[str]]) -> List[int]:
+    '''resolve columns by index or by name in the first row to indices
+    '''
+    names: Dict[str, int] = {}
+    if first is not None:
+        for j, name in enumerate(first):
+            names.setdefault(name, j)
+    idxs = []
+    for column in columns:
+        if type(column) is int:
+            idxs.append(column)
+        elif column in names:
+            idxs.append(names[column])
+        else:
+            logger.error(f'Column {column} not found in the header, ignoring...')
+    return idxs
+
+
+def _iter_rows_columns(rows: Iterator[List[str]], columns: List[Union[int, str]], header: bool) -> Iterator[List[str]]:
+    '''select columns by index or, if header, by name in the first row
+    '''
+    first = next(rows, None) if header else None
+    idxs = _resolve_columns(columns, first)
+    if not idxs:
+        return
+    n = max(idxs) + 1
+    for row in rows if first is None else chain((first,), rows):
+        if len(row) < n:
+            row = row + [''] * (n - len(row))
+        yield [row[j] for j in idxs]
+
+
+def _take(array: np.ndarray, idxs: range) -> np.ndarray:
+    '''index the first axis of array by a range
+    '''
+    if idxs.step == 1:
+        return array[idxs.start:idxs.stop]
+    return array[np.arange(idxs.start, idxs.stop, idxs.step)]
+
+
+def _take_columns(array: np.ndarray[np.str_], idxs: List[int]) -> np.ndarray[np.str_]:
+    '''select columns of array by indices, where those beyond are empty
+
+    Note that this can emit EmptyTableError
+    '''
+    if not idxs:
+        raise EmptyTableError
+    n = max(idxs) + 1
+    if n > array.shape[1]:
+        array = np.concatenate((array, np.full((array.shape[0], n - array.shape[1]), '', dtype=np.object_)), axis=1)
+    return array[:, idxs]
+
+
+def _select_array(
+    get_rows: Callable[[range], np.ndarray[np.str_]],
+    lengths: np.ndarray[np.int64],
+    options: PanTableOption,
+    slices: Optional[Sequence[slice]],
+) -> np.ndarray[np.str_]:
+    '''select rows and columns from a parsed table as `load_csv_array` does while reading
+
+    :param get_rows: get the rows in a range, padded to the same no. of columns
+    :param lengths: the original no. of cells of each row
+    '''
+    header = options.header
+    columns = options.columns
+    m = lengths.size
+    if slices is None:
+        idxs_all = [range(m)]
+    else:
+        start = int(header)
+        idxs_all = [range(min(start, m)), _select(slices, m, start=start)]
+    idxs_all = [idxs for idxs in idxs_all if idxs]
+    if not idxs_all:
         raise EmptyTableError
+    parts = [get_rows(idxs) for idxs in idxs_all]
+    res = np.concatenate(parts) if len(parts) > 1 else parts[0]
+    if columns is None:
+        res = res[:, :max(int(_take(lengths, idxs).max()) for idxs in idxs_all)]
+    else:
+        first = list(get_rows(range(1))[0, :lengths[0]]) if header and m else None
+        res = _take_columns(res, _resolve_columns(columns, first))
+    for cell in res.flat:
+        if cell.strip():
+            return res
+    raise EmptyTableError
+
+
+class ParsedTable:
+    '''a parsed table in memory, with the same interface as `pantable.cache.CachedTable`
+
+    the array is made read-only as views of it are shared.
+
+    :param lengths: the original no. of cells of each row
+    '''
+
+    def __init__(self, array: np.ndarray[np.str_], lengths: np.ndarray[np.int64]):
+        array.flags.writeable = False
+        self.array = array
+        self.lengths = lengths
+
+    def rows(self, idxs: range) -> np.ndarray[np.str_]:
+        return _take(self.array, idxs)
+
+
+#: per-process registry of parsed include files by resolved path, c.f. `load_include`
+_includes: Dict[str, Tuple[tuple, Union[CachedTable, ParsedTable]]] = {}
+
+
+def load_include(options: PanTableOption, parse: bool = True) -> Union[CachedTable, ParsedTable, None]:
+    '''load the include file parsed in full, once per process
+
+    The parsed table is kept in a registry keyed by the resolved path, encoding, csv_kwargs and file stat,
+    so code blocks including the same file share it.
+    On a miss it is loaded from the include cache if enabled, or parsed and saved there,
+    c.f. `pantable.cache.IncludeCache`.
+
+    :param parse: if False, return None instead of parsing the include file
+        if it is neither in the registry nor in the include cache
+
+    Note that this can emit EmptyTableError, FileNotFoundError
+    '''
+    include = options.include
+    csv_kwargs = options.csv_kwargs
+    encoding = options.include_encoding or locale.getpreferredencoding(False)
+    try:
+        stat = os.stat(include)
     except FileNotFoundError:
         raise FileNotFoundError(f'include path {include} not found.')
+    path = os.path.realpath(include)
+    key = (stat.st_size, stat.st_mtime_ns, codecs.lookup(encoding).name, json.dumps(csv_kwargs, sort_keys=True, default=str))
+    registered = _includes.get(path)
+    if registered is not None and registered[0] == key:
+        return registered[1]
+
+    include_cache = get_include_cache()
+    table: Union[CachedTable, ParsedTable, None] = None if include_cache is None else include_cache.load(include, stat, encoding, csv_kwargs)
+    if table is None:
+        if not parse:
+            return None
+        with open_csv('', options) as f:
+            res, lengths = parse_csv(f, csv_kwargs)
+        if include_cache is not None:
+            include_cache.save(include, stat, encoding, csv_kwargs, res, lengths)
+        table = ParsedTable(res, lengths)
+    _includes[path] = (key, table)
+    return table
+
+
+def clear_includes():
+    '''clear the registry of parsed include files
+    '''
+    _includes.clear()
 
 
 def load_csv_array(
     data: str,
     options: PanTableOption,
+    rows: Optional[Union[slice, Sequence[slice]]] = None,
 ) -> np.ndarray[np.str_]:
     '''loading CSV table in `numpy.ndarray`
 
+    Rows and columns not selected by options are dropped while reading inline data, c.f. `PanTableOption.row_slices`.
+    If `options.header`, the header row is always kept and the rows are selected among the rest.
+
+    :param rows: the rows to load, as a slice or slices applied one after another,
+        overriding the options. With `options.include_index`, the rows are read directly
+        from the include file using the row index, c.f. `load_row_offsets`.
+        Otherwise the rows are selected from the include file parsed once per process if available,
+        c.f. `load_include`, or else while reading it. Only loading the include file without selection
+        parses it in full, so the rows and columns not selected are never stored otherwise.
+
     Note that this can emit EmptyTableError, FileNotFoundError
     '''
-    table_list = load_csv(data, options)
-    m = len(table_list)
-    n = max(len(row) for row in table_list)
-    res = np.full((m, n), '', dtype=np.object_)
-    for i, row in enumerate(table_list):
-        for j, cell in enumerate(row):
-            res[i, j] = cell
-    return res
+    csv_kwargs = options.csv_kwargs
+    include = options.include
+    header = options.header
+    columns = options.columns
+    slices = options.row_slices() if rows is None else [rows] if isinstance(rows, slice) else rows
+
+    def project(rows: Iterable[List[str]]) -> Iterable[List[str]]:
+        return rows if columns is None else _iter_rows_columns(iter(rows), columns, header)
+
+    try:
+        # the row index is of plain files only
+        include_index = options.include_index and include and detect_compression(include) is None
+    except FileNotFoundError:
+        raise FileNotFoundError(f'include path {include} not found.')
+    if include and not include_index:
+        table = load_include(options, parse=slices is None and columns is None)
+        if table is not None:
+            return _select_array(table.rows, table.lengths, options, slices)
+
+    if slices is None:
+        with open_csv(data, options) as f:
+            if columns is None:
+                return parse_csv(f, csv_kwargs)[0]
+            return rows_to_array(project(csv.reader(f, **csv_kwargs)))
+
+    start = int(header)
+    if include_index:
+        encoding = options.include_encoding or locale.getpreferredencoding(False)
+        try:
+            offsets = load_row_offsets(include, encoding=encoding, csv_kwargs=csv_kwargs)
+        except FileNotFoundError:
+            raise FileNotFoundError(f'include path {include} not found.')
+        if offsets is not None:
+            idxs = _select(slices, offsets.size - 1, start=start)
+            if header and offsets.size > 1:
+                idxs_head = range(1)
+            else:
+                idxs_head = range(0)
+
+            def iter_rows(mm: mmap.mmap) -> Iterator[List[str]]:
+                for idxs_ in (idxs_head, idxs):
+                    if not idxs_:
+                        continue
+                    i_min = min(idxs_)
+                    i_max = max(idxs_) + 1
+                    reader = csv.reader(_iter_lines_offset(mm, encoding, offsets[i_min], offsets[i_max]), **csv_kwargs)
+                    if idxs_.step == 1:
+                        yield from reader
+                    else:
+                        rows_range = list(reader)
+                        for i in idxs_:
+                            yield rows_range[i - i_min]
+
+            if not (idxs_head or idxs):
+                raise EmptyTableError
+            with open(include, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return rows_to_array(project(iter_rows(mm)))
+
+    with open_csv(data, options) as f:
+        reader = csv.reader(f, **csv_kwargs)
+        head = list(islice(reader, start))
+        return rows_to_array(project(chain(head, _iter_rows_selected(reader, slices))))
+
+
+#: no. of rows joined at a time by `write_csv`
+WRITE_CHUNK_ROWS = 4096
+
+
+def write_csv(
+    data: np.ndarray[np.str_],
+    f: io.TextIOBase,
+    csv_kwargs: dict,
+):
+    '''write data as CSV to f, identical to `csv.writer(f, **csv_kwargs).writerows(data)`
+
+    With QUOTE_MINIMAL, the cells needing quotes are searched in the text of all cells at once.
+    Only the rows containing them are written by csv.writer, while the others are
+    interleaved with the delimiters and line terminators in an array and joined
+    in chunks of `WRITE_CHUNK_ROWS`.
+    '''
+    writer = csv.writer(f, **csv_kwargs)
+    dialect = writer.dialect
+    m, n = data.shape
+    delimiter = dialect.delimiter
+    lineterminator = dialect.lineterminator
+    specials = ''.join(set(delimiter + (dialect.quotechar or '') + lineterminator + '\r\n' + (dialect.escapechar or '')))
+    if not n or dialect.quoting != csv.QUOTE_MINIMAL or dialect.skipinitialspace or '\0' in specials:
+        writer.writerows(data)
+        return
+    flat = data.ravel().tolist()
+    try:
+        text = '\0'.join(flat)
+    # not all str
+    except TypeError:
+        writer.writerows(data)
+        return
+    # NUL separates the cells
+    if text.count('\0') != m * n - 1:
+        writer.writerows(data)
+        return
+    rows_special = set()
+    # faster than searching by regex if none
+    if any(char in text for char in specials):
+        k = 0
+        pos_last = 0
+        for match in re.finditer(f'[{re.escape(specials)}]', text):
+            pos = match.start()
+            k += text.count('\0', pos_last, pos)
+            pos_last = pos
+            rows_special.add(k // n)
+    del text
+    # a row of a single empty cell is quoted
+    if n == 1:
+        rows_special.update(np.flatnonzero(data[:, 0] == '').tolist())
+
+    cells = np.empty((m, 2 * n), dtype=np.object_)
+    cells[:, 0::2] = data
+    cells[:, 1::2] = delimiter
+    cells[:, -1] = lineterminator
+    start = 0
+    for i in chain(sorted(rows_special), (m,)):
+        for j in range(start, i, WRITE_CHUNK_ROWS):
+            f.write(''.join(cells[j:min(j + WRITE_CHUNK_ROWS, i)].ravel().tolist()))
+        if i < m:
+            writer.writerow(flat[i * n:(i + 1) * n])
+        start = i + 1
 
 
 def dump_csv(
@@ -77,31 +777,615 @@ def dump_csv(
     '''dump data as CSV string
     '''
     with io.StringIO(newline='') as f:
-        writer = csv.writer(f, **options.csv_kwargs)
-        writer.writerows(data)
+        write_csv(data, f, options.csv_kwargs)
         return f.getvalue()
 
 
+#: policies of writing to existing include files, c.f. `write_include`
+OVERWRITES = ('never', 'changed', 'always')
+
+_overwrite: Optional[str] = None
+
+
+def get_overwrite() -> str:
+    '''get the overwrite policy, from env. var. `PANTABLEOVERWRITE` on first use
+    '''
+    if _overwrite is None:
+        set_overwrite(os.environ.get('PANTABLEOVERWRITE', 'never'))
+    return _overwrite
+
+
+def set_overwrite(overwrite: str):
+    '''set the policy of writing to existing include files
+
+    :param str overwrite: one of
+
+        - `never`: existing include files are not written, and the data is dumped in the CodeBlock instead.
+        - `changed`: overwrite only if the content changed, so its modification time is kept otherwise.
+        - `always`: always overwrite.
+    '''
+    global _overwrite
+    overwrite = overwrite.strip().lower()
+    if overwrite not in OVERWRITES:
+        logger.error(f'Unknown overwrite policy {overwrite}, set to default never.')
+        overwrite = 'never'
+    _overwrite = overwrite
+
+
+def file_digest(
+    path: Path,
+    compression: Optional[str] = None,
+) -> bytes:
+    '''sha256 of the content of path, decompressed if compression
+    '''
+    h = hashlib.sha256()
+    with (open(path, 'rb') if compression is None else open_compressed(path, compression, 'rb')) as f:
+        for chunk in iter(partial(f.read, CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def write_include(
+    include: Union[str, Path],
+    write: Callable[[BinaryIO], None],
+    compression: Optional[str] = None,
+    overwrite: Optional[str] = None,
+) -> bool:
+    '''write include by `write(f)` with a binary file f, according to the overwrite policy
+
+    Existing files are replaced atomically by writing to a temporary file next to it first.
+
+    :param compression: of the content written, to compare the content decompressed
+    :param overwrite: c.f. `set_overwrite`, default to `get_overwrite()`
+    :return: False if the write is skipped as the content is unchanged
+
+    It raises FileExistsError if include exists and overwrite is never.
+    '''
+    include = Path(include)
+    if overwrite is None:
+        overwrite = get_overwrite()
+    include.parent.mkdir(parents=True, exist_ok=True)
+    if overwrite == 'never':
+        with open(include, 'xb') as f:
+            write(f)
+        return True
+    temp = include.with_name(f'.{include.name}.{os.getpid()}.tmp')
+    try:
+        with open(temp, 'wb') as f:
+            write(f)
+        exists = include.is_file()
+        if exists and overwrite == 'changed':
+            try:
+                # sizes differ in compressed files with the same content
+                same_size = compression is not None or temp.stat().st_size == include.stat().st_size
+                unchanged = same_size and file_digest(temp, compression) == file_digest(include, compression)
+            # e.g. not in this compression
+            except Exception as e:
+                logger.debug(f'Cannot read {include}, overwriting: {e}')
+                unchanged = False
+            if unchanged:
+                logger.info(f'{include} is unchanged, skipping...')
+                temp.unlink()
+                return False
+        if exists:
+            try:
+                shutil.copymode(include, temp)
+            except OSError:
+                pass
+        os.replace(temp, include)
+    except BaseException:
+        try:
+            temp.unlink()
+        except OSError:
+            pass
+        raise
+    return True
+
+
 def dump_csv_io(
     data: np.ndarray[np.str_],
     options: PanTableOption,
+    overwrite: Optional[str] = None,
 ) -> str:
     '''dump data as CSV
 
+    The data is written directly to the include file if set,
+    compressed according to its extension, c.f. `detect_compression`,
+    and according to the overwrite policy, c.f. `write_include`.
+
     it will mutate options.include if it is an invalid write path.
     '''
     _include = options.include
 
-    text = dump_csv(data, options)
-
     if _include:
+        encoding = options.include_encoding or None
+        compression = detect_compression(_include, magic=False)
+
+        def write(raw: BinaryIO):
+            if compression is None:
+                f = io.TextIOWrapper(raw, encoding=encoding, newline='')
+            else:
+                f = open_compressed(raw, compression, 'wt', encoding=encoding)
+            with f:
+                write_csv(data, f, options.csv_kwargs)
+
         try:
-            include = Path(_include)
-            include.parent.mkdir(parents=True, exist_ok=True)
-            with open(include, 'x', encoding=options.include_encoding, newline='') as f:
-                f.write(text)
+            write_include(_include, write, compression=compression, overwrite=overwrite)
             return ''
         except (PermissionError, FileExistsError):
             logger.error(f'Data cannot be written to file {options.include}, Overriding include path to empty...')
             options.include = ''
-    return text
+    return dump_csv(data, options)
+
+
+#: formats other than csv, and the extensions of include files they are inferred from, c.f. `infer_format`
+FORMAT_EXTENSIONS = {
+    'parquet': ('.parquet', '.pq'),
+    'feather': ('.feather', '.arrow', '.arrows'),
+    'jsonl': ('.jsonl', '.ndjson'),
+    'json': ('.json',),
+    'sqlite': ('.sqlite', '.sqlite3', '.db'),
+}
+
+
+def infer_format(include: str) -> Optional[str]:
+    '''infer the format from the extension of include, after that of its compression if any
+    '''
+    root, suffix = os.path.splitext(include)
+    if detect_compression(include, magic=False) is not None:
+        suffix = os.path.splitext(root)[1]
+    suffix = suffix.lower()
+    for format, suffixes in FORMAT_EXTENSIONS.items():
+        if suffix in suffixes:
+            return format
+    return None
+
+
+def _arrow_to_str(column) -> List[str]:
+    '''convert a pyarrow column to str, null to empty string
+    '''
+    import pyarrow as pa
+
+    try:
+        column = column.cast(pa.string())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return ['' if value is None else str(value) for value in column.to_pylist()]
+    return ['' if value is None else value for value in column.to_pylist()]
+
+
+def load_arrow_array(
+    data: str,
+    options: PanTableOption,
+    rows: Optional[Union[slice, Sequence[slice]]] = None,
+) -> np.ndarray[np.str_]:
+    '''loading Parquet or Arrow IPC (Feather v2) table from include in `numpy.ndarray`
+
+    Only the selected columns are read, and only the row groups (Parquet) or record batches (Arrow IPC)
+    containing the selected rows, c.f. `load_csv_array` for the options and rows.
+    The column names are the header row if `options.header`, and columns can always be selected by name.
+
+    Note that this can emit EmptyTableError, FileNotFoundError, ImportError, ValueError
+    '''
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError(f'Format {options.format} requires pyarrow, please run "pip install pyarrow".')
+
+    include = options.include
+    if not include:
+        raise ValueError(f'Format {options.format} requires include.')
+    if not os.path.exists(include):
+        raise FileNotFoundError(f'include path {include} not found.')
+
+    # the arrays read are zero-copy from the file
+    with ExitStack() as stack:
+        if options.format == 'parquet':
+            import pyarrow.parquet as pq
+
+            file = stack.enter_context(pq.ParquetFile(include))
+            names = file.schema_arrow.names
+            sizes = [file.metadata.row_group(i).num_rows for i in range(file.num_row_groups)]
+
+            def read(i: int, names_read: List[str]):
+                return file.read_row_group(i, columns=names_read)
+        else:
+            from pyarrow import ipc
+
+            reader = stack.enter_context(ipc.open_file(stack.enter_context(pa.memory_map(include))))
+            names = reader.schema.names
+            # batches are zero-copy from the memory map so this reads metadata only
+            sizes = [reader.get_batch(i).num_rows for i in range(reader.num_record_batches)]
+
+            def read(i: int, names_read: List[str]):
+                return pa.Table.from_batches([reader.get_batch(i)]).select(names_read)
+
+        n_names = len(names)
+        columns = options.columns
+        if columns is None:
+            idxs_col = list(range(n_names))
+        else:
+            idxs_col = []
+            for j in _resolve_columns(columns, names):
+                if j < n_names:
+                    idxs_col.append(j)
+                else:
+                    logger.error(f'Column {j} not found in {include}, ignoring...')
+        names_read = list(dict.fromkeys(names[j] for j in idxs_col))
+
+        slices = options.row_slices() if rows is None else [rows] if isinstance(rows, slice) else rows
+        m = sum(sizes)
+        idxs = range(m) if slices is None else _select(slices, m)
+
+        header = options.header
+        res = np.full((int(header) + len(idxs), len(idxs_col)), '', dtype=np.object_)
+        if header:
+            res[0] = [names[j] for j in idxs_col]
+        if idxs and idxs_col:
+            i_min = min(idxs)
+            i_max = max(idxs) + 1
+            tables = []
+            base = None
+            start = 0
+            for i, size in enumerate(sizes):
+                stop = start + size
+                # skip row groups without selected rows
+                if stop > i_min and start < i_max:
+                    if base is None:
+                        base = start
+                    tables.append(read(i, names_read))
+                start = stop
+            table = pa.concat_tables(tables).slice(i_min - base, i_max - i_min)
+            for k, j in enumerate(idxs_col):
+                values = np.empty(i_max - i_min, dtype=np.object_)
+                values[:] = _arrow_to_str(table.column(names_read.index(names[j])))
+                res[int(header):, k] = _take(values, range(idxs.start - i_min, idxs.stop - i_min, idxs.step))
+        for cell in res.flat:
+            if cell.strip():
+                return res
+        raise EmptyTableError
+
+
+def dump_arrow_io(
+    data: np.ndarray[np.str_],
+    options: PanTableOption,
+) -> str:
+    '''dump data as Parquet or Arrow IPC (Feather v2) to include
+
+    The columns are strings, named by the header row if `options.header` else by their indices.
+
+    it will mutate options.include and options.format to fall back to CSV in the CodeBlock
+    if it is an invalid write path, or pyarrow is not installed.
+    '''
+    _include = options.include
+    try:
+        import pyarrow as pa
+    except ImportError:
+        logger.error(f'Format {options.format} requires pyarrow, please run "pip install pyarrow". Falling back to csv...')
+        _include = ''
+    else:
+        if not _include:
+            logger.error(f'Format {options.format} requires include, falling back to csv...')
+    if _include:
+        m, n = data.shape
+        if options.header and m:
+            names = [str(name) for name in data[0]]
+            body = data[1:]
+        else:
+            names = [str(j) for j in range(n)]
+            body = data
+        table = pa.table([pa.array(list(body[:, j]), type=pa.string()) for j in range(n)], names=names)
+
+        def write(f: BinaryIO):
+            if options.format == 'parquet':
+                import pyarrow.parquet as pq
+
+                pq.write_table(table, f)
+            else:
+                from pyarrow import ipc
+
+                with ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+
+        try:
+            write_include(_include, write)
+            return ''
+        except (PermissionError, FileExistsError):
+            logger.error(f'Data cannot be written to file {options.include}, falling back to csv...')
+    options.include = ''
+    options.format = 'csv'
+    return dump_csv(data, options)
+
+
+def _json_to_str(value) -> str:
+    '''convert a decoded JSON value to a cell, null to empty string
+    '''
+    if type(value) is str:
+        return value
+    if value is None:
+        return ''
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _iter_json_lines(lines: Iterable[str]) -> Iterator:
+    '''decode JSON Lines one at a time, skipping invalid lines
+    '''
+    for line in lines:
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            logger.error(f'Invalid JSON line {line.strip()}, ignoring...: {e}')
+
+
+_json_space_pat = re.compile(r'[ \t\n\r]*')
+
+
+def _iter_json_array(text: str) -> Iterator:
+    '''decode the values of a JSON array one at a time
+
+    Note that this can emit ValueError
+    '''
+    decoder = json.JSONDecoder()
+    space = _json_space_pat.match
+    idx = space(text).end()
+    if text[idx:idx + 1] != '[':
+        raise ValueError('Expecting a JSON array of records.')
+    idx = space(text, idx + 1).end()
+    if text[idx:idx + 1] == ']':
+        return
+    while True:
+        value, idx = decoder.raw_decode(text, idx)
+        yield value
+        idx = space(text, idx).end()
+        char = text[idx:idx + 1]
+        if char == ']':
+            return
+        if char != ',':
+            raise ValueError(f'Expecting , or ] at position {idx} of the JSON array.')
+        idx = space(text, idx + 1).end()
+
+
+def load_json_array(
+    data: str,
+    options: PanTableOption,
+    rows: Optional[Union[slice, Sequence[slice]]] = None,
+) -> np.ndarray[np.str_]:
+    '''loading JSON Lines (format jsonl) or a JSON array (format json) of records in `numpy.ndarray`
+
+    The records are decoded one at a time and stored into the array directly.
+    The columns are the keys of all the records in the order first seen, whether selected or not,
+    which are the header row if `options.header`, and columns can always be selected by name.
+    A record can also be an array of cells or a single cell. Non-string values are dumped as JSON.
+    With JSON Lines, only the selected rows are stored, c.f. `load_csv_array` for the options and rows,
+    after a scan of the keys of all records.
+
+    Note that this can emit EmptyTableError, FileNotFoundError, ValueError
+    '''
+    header = options.header
+    columns = options.columns
+    slices = options.row_slices() if rows is None else [rows] if isinstance(rows, slice) else rows
+    names: Dict[str, int] = {}
+
+    def register(records: Iterable) -> Iterator:
+        for record in records:
+            if type(record) is dict:
+                for key in record:
+                    names.setdefault(key, len(names))
+            yield record
+
+    def iter_rows(records: Iterable) -> Iterator[List[str]]:
+        # placeholder of the header row, filled when all names are known
+        if header:
+            yield []
+        for record in records:
+            if type(record) is dict:
+                row = [''] * len(names)
+                for key, value in record.items():
+                    row[names[key]] = _json_to_str(value)
+                yield row
+            elif type(record) is list:
+                yield [_json_to_str(value) for value in record]
+            else:
+                yield [_json_to_str(record)]
+
+    if options.format == 'jsonl':
+        if slices is not None:
+            # scan the keys of all records first, skipping invalid lines silently as they are reported below if selected
+            with open_csv(data, options) as f:
+                for line in f:
+                    if line.strip():
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if type(record) is dict:
+                            for key in record:
+                                names.setdefault(key, len(names))
+        with open_csv(data, options) as f:
+            lines: Iterable[str] = (line for line in f if line.strip())
+            if slices is not None:
+                lines = _iter_rows_selected(lines, slices)
+            res = rows_to_array(iter_rows(register(_iter_json_lines(lines))))
+    else:
+        with open_csv(data, options) as f:
+            records = register(_iter_json_array(''.join(f)))
+            res = rows_to_array(iter_rows(records if slices is None else _iter_rows_selected(records, slices)))
+            # the keys of the records after the selected ones
+            for _ in records:
+                pass
+    m, n = res.shape
+    if n < len(names):
+        res = np.concatenate((res, np.full((m, len(names) - n), '', dtype=np.object_)), axis=1)
+    if header:
+        res[0, :len(names)] = list(names)
+    if columns is not None:
+        res = _take_columns(res, _resolve_columns(columns, list(names)))
+        for cell in res.flat:
+            if cell.strip():
+                return res
+        raise EmptyTableError
+    return res
+
+
+#: no. of rows fetched from SQLite at a time
+SQLITE_BATCH_SIZE = 1024
+
+#: per-process registry of read-only SQLite connections by resolved path
+_sqlite_connections: Dict[str, sqlite3.Connection] = {}
+
+
+def _sqlite_connect(include: str) -> sqlite3.Connection:
+    '''get the read-only connection to the SQLite database include, reused across code blocks
+
+    Note that this can emit FileNotFoundError, sqlite3.Error
+    '''
+    if not os.path.isfile(include):
+        raise FileNotFoundError(f'include path {include} not found.')
+    path = os.path.realpath(include)
+    conn = _sqlite_connections.get(path)
+    if conn is None:
+        conn = _sqlite_connections[path] = sqlite3.connect(f'{Path(path).as_uri()}?mode=ro', uri=True, check_same_thread=False)
+    return conn
+
+
+def _sqlite_to_str(value) -> str:
+    '''convert a SQLite value to a cell, NULL to empty string
+    '''
+    if type(value) is str:
+        return value
+    if value is None:
+        return ''
+    if type(value) is bytes:
+        return value.hex()
+    return str(value)
+
+
+def load_sqlite_array(
+    data: str,
+    options: PanTableOption,
+    rows: Optional[Union[slice, Sequence[slice]]] = None,
+) -> np.ndarray[np.str_]:
+    '''loading the result of `options.query` on the SQLite database include in `numpy.ndarray`
+
+    The rows are fetched in batches of `SQLITE_BATCH_SIZE` and stored into the array directly,
+    so filtering, sorting and aggregation should be done in the query.
+    The column names are the header row if `options.header`, and columns can always be selected by name.
+    Fetching stops once the selected rows are read, c.f. `load_csv_array` for the options and rows.
+
+    Note that this can emit EmptyTableError, FileNotFoundError, ValueError
+    '''
+    include = options.include
+    query = options.query
+    if not (include and query):
+        raise ValueError('Format sqlite requires include and query.')
+    slices = options.row_slices() if rows is None else [rows] if isinstance(rows, slice) else rows
+    try:
+        cursor = _sqlite_connect(include).execute(query)
+    except sqlite3.Error as e:
+        raise ValueError(f'Cannot run query {query} on {include}: {e}')
+    try:
+        if cursor.description is None:
+            raise EmptyTableError
+        names = [description[0] for description in cursor.description]
+        idxs_col = list(range(len(names))) if options.columns is None else _resolve_columns(options.columns, names)
+        if not idxs_col:
+            raise EmptyTableError
+        n = len(names)
+
+        def iter_rows() -> Iterator[List[str]]:
+            if options.header:
+                yield [names[j] if j < n else '' for j in idxs_col]
+            records: Iterable[tuple] = chain.from_iterable(iter(partial(cursor.fetchmany, SQLITE_BATCH_SIZE), []))
+            if slices is not None:
+                records = _iter_rows_selected(records, slices)
+            for record in records:
+                yield [_sqlite_to_str(record[j]) if j < n else '' for j in idxs_col]
+
+        try:
+            return rows_to_array(iter_rows())
+        except sqlite3.Error as e:
+            raise ValueError(f'Cannot run query {query} on {include}: {e}')
+    finally:
+        cursor.close()
+
+
+_glob_pat = re.compile(r'[*?[]')
+
+
+def expand_include(include: Union[str, List[str]]) -> Optional[List[str]]:
+    '''expand include as a list of paths or glob patterns, in order, where the matches of each pattern are sorted
+
+    returns None if include is a single path.
+
+    Note that this can emit FileNotFoundError, ValueError
+    '''
+    if isinstance(include, str):
+        if not _glob_pat.search(include) or os.path.exists(include):
+            return None
+        include = [include]
+    if not include:
+        raise ValueError('Option include cannot be an empty list.')
+    paths: List[str] = []
+    for pattern in include:
+        if not _glob_pat.search(pattern) or os.path.exists(pattern):
+            paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f'include path {pattern} not found.')
+        paths += matches
+    return paths
+
+
+def load_include_files(
+    load: Callable[[str, PanTableOption], np.ndarray[np.str_]],
+    data: str,
+    options: PanTableOption,
+    paths: List[str],
+) -> np.ndarray[np.str_]:
+    '''load include files concurrently in a thread pool and concatenate them in the order of paths
+
+    If `options.header`, the header row of each file but the first is dropped,
+    and a warning is logged if it differs from the first.
+    Each file is loaded in full and the rows are selected from the concatenated rows, c.f. `load_csv_array`.
+
+    :param load: load a single include file, c.f. `load_csv_array`
+
+    Note that this can emit EmptyTableError, FileNotFoundError
+    '''
+    header = options.header
+    options_all = replace(options, rows=None, head=None, tail=None)
+
+    def load_path(path: str) -> Optional[np.ndarray[np.str_]]:
+        try:
+            return load(data, replace(options_all, include=path))
+        except EmptyTableError:
+            return None
+
+    with ThreadPoolExecutor() as executor:
+        loaded = [(path, table) for path, table in zip(paths, executor.map(load_path, paths)) if table is not None]
+    if not loaded:
+        raise EmptyTableError
+    tables = [table for _, table in loaded]
+
+    start = int(header)
+    n = max(table.shape[1] for table in tables)
+    m = tables[0].shape[0] + sum(table.shape[0] - start for table in tables[1:])
+    res = np.full((m, n), '', dtype=np.object_)
+    i = 0
+    for k, (path, table) in enumerate(loaded):
+        if k and header:
+            n_table = table.shape[1]
+            if not np.array_equal(table[0], res[0, :n_table]) or any(res[0, n_table:]):
+                logger.warning(f'Header row of {path} differs from the first, dropped anyway...')
+            table = table[1:]
+        m_table, n_table = table.shape
+        res[i:i + m_table, :n_table] = table
+        i += m_table
+
+    slices = options.row_slices()
+    if slices is not None:
+        res = np.concatenate((res[:start], _take(res, _select(slices, m, start=start))))
+    for cell in res.flat:
+        if cell.strip():
+            return res
+    raise EmptyTableError
@@ -1,27 +1,151 @@
 from __future__ import annotations
 
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from logging import getLogger
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 from panflute.elements import Table
 
 if TYPE_CHECKING:
-    from typing import Optional
+    from concurrent.futures import Future
+    from typing import Dict, List, Optional, Set, Tuple, Union
 
-    from panflute.elements import Doc
+    import numpy as np
+    from panflute.elements import CodeBlock, Doc, Element
 
-from .ast import PanTable
+    from .ast import PanTableMarkdown, PanTableOption
+
+from .ast import PanCodeBlock, PanTable
+from .io import dump_csv, dump_csv_io, file_digest, write_include
+
+logger = getLogger('pantable')
+
+_name_pat = re.compile(r'[^\w.-]+')
+
+
+class TableExporter:
+    '''export the data of tables to CSV files in a directory, with a manifest
+
+    Each table is written to `<path>/<identifier-or-index>.csv` by `dump_csv_io` on a background thread pool,
+    so that the file I/O overlaps with the conversion of the next tables.
+    `close` waits for the writes and then writes the manifest `<path>/manifest.json`
+    of the options and sha256 checksums of the files.
+    Tables that cannot be written are inlined in their CodeBlock instead.
+
+    :param path: the export directory
+    :param max_workers: of the thread pool
+    :param overwrite: the policy of writing to existing files in path, c.f. `set_overwrite`,
+        default to `changed` such that exporting again to the same directory updates it
+    '''
+
+    #: name of the manifest in the export directory
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, path: Union[str, Path], max_workers: Optional[int] = None, overwrite: str = 'changed'):
+        self.path = Path(path)
+        self.overwrite = overwrite
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pantable-export')
+        self.names: Set[str] = set()
+        self.exports: List[Tuple[CodeBlock, PanCodeBlock, np.ndarray, Future]] = []
+
+    def _name(self, identifier: str) -> str:
+        '''a unique file name from identifier or the index of the table
+        '''
+        index = len(self.exports)
+        name = _name_pat.sub('_', identifier).strip('._') or str(index)
+        if name in self.names:
+            name = f'{name}-{index}'
+        self.names.add(name)
+        return f'{name}.csv'
+
+    def _write(self, data: np.ndarray[np.str_], options: PanTableOption) -> Tuple[str, Optional[str]]:
+        '''the fallback data of the CodeBlock and the checksum of the file written
+        '''
+        text = dump_csv_io(data, options, overwrite=self.overwrite)
+        return text, (None if text else file_digest(Path(options.include)).hex())
+
+    def to_pancodeblock(
+        self,
+        pan_table_markdown: PanTableMarkdown,
+        fancy_table: bool = False,
+        csv_kwargs: Optional[dict] = None,
+    ) -> CodeBlock:
+        '''c.f. `PanTableMarkdown.to_pancodeblock`, but with the data written in the background
+        '''
+        include = self.path / self._name(pan_table_markdown.ica_table.identifier)
+        options = pan_table_markdown.to_pantableoption(fancy_table=fancy_table, include=str(include), csv_kwargs=csv_kwargs)
+        data = pan_table_markdown.to_str_array(fancy_table=fancy_table)
+        pan_codeblock = PanCodeBlock('', options=options, ica=pan_table_markdown.ica_table)
+        code_block = pan_codeblock.to_panflute_ast()
+        # options may be mutated by dump_csv_io
+        future = self.executor.submit(self._write, data, replace(options))
+        self.exports.append((code_block, pan_codeblock, data, future))
+        return code_block
+
+    def close(self) -> List[dict]:
+        '''wait for all writes, inline the tables that cannot be written, and write the manifest
+
+        :return: the entries of the manifest
+        '''
+        self.executor.shutdown()
+        path = self.path
+        manifest: List[dict] = []
+        for index, (code_block, pan_codeblock, data, future) in enumerate(self.exports):
+            options = pan_codeblock.options
+            try:
+                text, checksum = future.result()
+            except Exception as e:
+                logger.error(f'Cannot export table {index} to {options.include}, inlining it: {e}')
+                text, checksum = dump_csv(data, options), None
+            if text:
+                options.include = ''
+                pan_codeblock.data = text
+                code_block.text = pan_codeblock.to_panflute_ast().text
+            m, n = data.shape
+            manifest.append({
+                'index': index,
+                'identifier': pan_codeblock.ica.identifier,
+                'path': Path(options.include).relative_to(path).as_posix() if options.include else None,
+                'shape': [m, n],
+                'sha256': checksum,
+                'options': options.kwargs,
+            })
+        self.exports = []
+        try:
+            write_include(
+                path / self.MANIFEST,
+                lambda f: f.write(json.dumps({'tables': manifest}, indent=2, default=str).encode('utf-8')),
+                overwrite=self.overwrite,
+            )
+        except OSError as e:
+            logger.error(f'Cannot write manifest to {path}: {e}')
+        return manifest
 
 
 def table_to_codeblock(
     element: Optional[Table] = None,
     doc: Optional[Doc] = None,
-    format: str = 'csv',
+    format: Optional[str] = None,
     fancy_table: bool = False,
     include: str = '',
     csv_kwargs: Optional[dict] = None,
+    exporter: Optional[TableExporter] = None,
 ) -> Optional[PanTable]:
-    """convert Table element and to csv table in code-block with class "table" in panflute AST"""
+    """convert Table element and to csv table in code-block with class "table" in panflute AST
+
+    if exporter is given, the data is exported by it instead, ignoring format and include.
+    """
     if type(element) is Table:
+        if exporter is not None:
+            return exporter.to_pancodeblock(
+                PanTable.from_panflute_ast(element).to_pantablemarkdown(),
+                fancy_table=fancy_table,
+                csv_kwargs=csv_kwargs,
+            )
         return (
             PanTable
             .from_panflute_ast(element)
@@ -36,3 +160,63 @@ def table_to_codeblock(
             .to_panflute_ast()
         )
     return None
+
+
+def tables_to_codeblocks(
+    doc: Doc,
+    format: Optional[str] = None,
+    fancy_table: bool = False,
+    include: str = '',
+    csv_kwargs: Optional[dict] = None,
+    exporter: Optional[TableExporter] = None,
+) -> Doc:
+    """convert all Table elements in doc to csv table in code-block with class "table"
+
+    This has the same result as walking `table_to_codeblock` through the doc,
+    but the panflute elements from all tables are converted to markdown together in one batch.
+    So pandoc is called once per document rather than once per table.
+    """
+    def action_collect(elem: Element, doc: Doc):
+        if type(elem) is Table:
+            elements.append(elem)
+
+    def action_replace(elem: Element, doc: Doc) -> Optional[CodeBlock]:
+        return results.get(id(elem))
+
+    # tables nested in other tables are converted first, as in the walk of `table_to_codeblock`,
+    # so each round converts the tables that do not contain other tables
+    while True:
+        elements: List[Table] = []
+        doc.walk(action_collect)
+        if not elements:
+            return doc
+        has_nested: Set[int] = set()
+        for element in elements:
+            parent = element.parent
+            while parent is not None:
+                if type(parent) is Table:
+                    has_nested.add(id(parent))
+                parent = parent.parent
+        elements = [element for element in elements if id(element) not in has_nested]
+
+        pan_table_markdowns = PanTable.batch_to_pantablemarkdown([PanTable.from_panflute_ast(element) for element in elements])
+        # the elements are kept alive in elements so their ids are unique
+        results: Dict[int, CodeBlock] = {
+            id(element): exporter.to_pancodeblock(
+                pan_table_markdown,
+                fancy_table=fancy_table,
+                csv_kwargs=csv_kwargs,
+            ) if exporter is not None else (
+                pan_table_markdown
+                # no options chosen here to match historical behavior
+                .to_pancodeblock(
+                    format=format,
+                    fancy_table=fancy_table,
+                    include=include,
+                    csv_kwargs=csv_kwargs,
+                )
+                .to_panflute_ast()
+            )
+            for element, pan_table_markdown in zip(elements, pan_table_markdowns)
+        }
+        doc.walk(action_replace)
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import json
+import re
 from functools import partial
+from itertools import chain
 from logging import getLogger
 from typing import TYPE_CHECKING, Any, _SpecialForm, get_type_hints
 
@@ -10,11 +13,14 @@ if not PY37:
     from typing import get_args, get_origin
 
 import numpy as np
-from panflute.elements import ListContainer, Para, Str
-from panflute.tools import convert_text, run_pandoc, yaml_filter
+from panflute.elements import ListContainer, Para, Plain, SoftBreak, Space, Str, from_json
+from panflute.tools import run_pandoc, yaml_filter
+
+from .cache import ConversionCache, get_cache
+from .converter import convert_text, get_converter
 
 if TYPE_CHECKING:
-    from typing import Callable, Dict, Generator, Iterable, Iterator, List, Optional, Tuple
+    from typing import Callable, Dict, Generator, Iterable, Iterator, List, Optional, Tuple, Union
 
     from panflute.elements import Element
 
@@ -53,12 +59,258 @@ def convert_texts(
     return _map_parallel(_convert_text, texts)
 
 
-def iter_convert_texts_markdown_to_panflute(
+def _convert_cached(
+    inputs: List[Any],
+    texts: List[str],
+    input_format: str,
+    output_format: str,
+    extra_args: Optional[List[str]],
+    convert: Callable[[List[Any]], Iterable[Any]],
+    dump: Callable[[Any], str],
+    load: Callable[[str], Any],
+    independent: Callable[[str], bool],
+) -> List[Any]:
+    '''convert inputs in a batch, reusing cached outputs
+
+    :param texts: inputs serialized to str, which are hashed for the cache keys
+    :param convert: batch convert inputs to outputs
+    :param dump: serialize an output to str for the cache
+    :param load: deserialize an output from the cache
+    :param independent: if the output of a text is independent of the others converted with it.
+        Only those are cached.
+    '''
+    cache = get_cache()
+    if cache is None:
+        return list(convert(inputs))
+
+    version = get_converter().version
+    # None is never in the cache
+    keys = [
+        ConversionCache.key(text, input_format, output_format, version, extra_args) if independent(text) else None
+        for text in texts
+    ]
+    cached = cache.get_many(key for key in keys if key is not None)
+    idxs_miss = [i for i, key in enumerate(keys) if key not in cached]
+    res: List[Any] = [None] * len(inputs)
+    if idxs_miss:
+        logger.debug(f'Converting {len(idxs_miss)} of {len(inputs)} fragments from {input_format} to {output_format}, others cached.')
+        cache_new = {}
+        for i, output in zip(idxs_miss, convert([inputs[i] for i in idxs_miss])):
+            res[i] = output
+            if keys[i] is not None:
+                cache_new[keys[i]] = dump(output)
+        cache.set_many(cache_new)
+    for i, key in enumerate(keys):
+        if key in cached:
+            res[i] = load(cached[key])
+    return res
+
+
+def _convert_unique(
+    inputs: List[Any],
+    convert: Callable[[List[Any], List[str]], List[Any]],
+    independent: Callable[[str], bool],
+    to_text: Optional[Callable[[Any], str]] = None,
+    copy: Optional[Callable[[Any], Any]] = None,
+) -> List[Any]:
+    '''convert each unique input once and fan the outputs back out
+
+    :param convert: batch convert unique inputs and their texts to outputs
+    :param independent: if the output of a text is independent of the others converted with it.
+        Repeated inputs that are not are converted each time.
+    :param to_text: serialize an input to str, identical inputs have identical texts.
+        Default to inputs being str already.
+    :param copy: copy an output for each repeated input, for mutable outputs
+    '''
+    texts: List[str] = inputs if to_text is None else [to_text(input_) for input_ in inputs]
+    idxs: Dict[str, int] = {}
+    idxs_input: List[int] = []
+    inputs_unique = []
+    texts_unique = []
+    for input_, text in zip(inputs, texts):
+        if text in idxs and independent(text):
+            idxs_input.append(idxs[text])
+            continue
+        idxs[text] = len(inputs_unique)
+        idxs_input.append(len(inputs_unique))
+        inputs_unique.append(input_)
+        texts_unique.append(text)
+    outputs = convert(inputs_unique, texts_unique)
+    if len(inputs_unique) == len(inputs):
+        return outputs
+
+    res = []
+    used = [False] * len(outputs)
+    for i in idxs_input:
+        if used[i] and copy is not None:
+            res.append(copy(outputs[i]))
+        else:
+            used[i] = True
+            res.append(outputs[i])
+    return res
+
+
+def _dump_blocks(elem: ListContainer) -> str:
+    return json.dumps([block.to_json() for block in elem], ensure_ascii=False)
+
+
+def _load_blocks(text: str) -> ListContainer:
+    return ListContainer(*json.loads(text, object_hook=from_json))
+
+
+def _copy_blocks(elem: ListContainer) -> ListContainer:
+    return _load_blocks(_dump_blocks(elem))
+
+
+def _convert_fast(
+    inputs: List[Any],
+    convert: Callable[[List[Any]], Iterable[Any]],
+    fast: Callable[[Any], Any],
+) -> List[Any]:
+    '''convert inputs by fast in Python, leaving those it returns None for to a batch convert
+    '''
+    res = [fast(input_) for input_ in inputs]
+    idxs_slow = [i for i, output in enumerate(res) if output is None]
+    if idxs_slow:
+        logger.debug(f'Converting {len(idxs_slow)} of {len(inputs)} fragments by pandoc, others by Python.')
+        for i, output in zip(idxs_slow, convert([inputs[i] for i in idxs_slow])):
+            res[i] = output
+    return res
+
+
+#: characters other than alphanumerics and space that never start markdown syntax
+#: in the middle of a single line of text
+PLAIN_MARKDOWN_PUNCTUATIONS = frozenset(',;/%?!+-=.:')
+_RE_LIST_MARKER = re.compile(r'[^\W_]+\.')
+
+
+def is_plain_markdown(text: str) -> bool:
+    '''check if text is certainly without markdown syntax
+
+    This is conservative, i.e. some texts without markdown syntax are not detected.
+    Apart from the markdown syntax, it rules out what pandoc's smart extension would change,
+    such as dashes, ellipses and abbreviations.
+    '''
+    stripped = text.lstrip(' ')
+    # 4 spaces is a code block
+    if len(text) - len(stripped) > 3:
+        return False
+    if not stripped:
+        return True
+    # not a list, header, etc.
+    if not stripped[0].isalnum():
+        return False
+    for char in stripped:
+        if not (char.isalnum() or char == ' ' or char in PLAIN_MARKDOWN_PUNCTUATIONS):
+            return False
+    if '--' in stripped or '..' in stripped:
+        return False
+    words = stripped.split()
+    # ordered list such as 1. or iv., or abbreviations such as Mr. with a non-breaking space
+    if _RE_LIST_MARKER.fullmatch(words[0]) or any(word[-1] == '.' for word in words[:-1]):
+        return False
+    return True
+
+
+def plain_markdown_to_panflute(text: str) -> Optional[ListContainer]:
+    '''convert text to panflute in Python if it is plain, c.f. :func:`is_plain_markdown`
+
+    :return: the same as pandoc's output, or None if text is not plain
+    '''
+    if not is_plain_markdown(text):
+        return None
+    words = text.split()
+    if not words:
+        return ListContainer()
+    inlines = [Str(words[0])]
+    for word in words[1:]:
+        inlines.append(Space())
+        inlines.append(Str(word))
+    return ListContainer(Para(*inlines))
+
+
+#: characters that pandoc's markdown writer always escapes by a backslash
+PLAIN_MARKDOWN_ESCAPES = frozenset('\\*`[]<>$^~|\'"')
+_ESCAPES = str.maketrans({char: '\\' + char for char in PLAIN_MARKDOWN_ESCAPES})
+_ESCAPES_CHECK = str.maketrans({char: 'a' for char in PLAIN_MARKDOWN_ESCAPES})
+#: pandoc's default --columns
+COLUMNS = 72
+
+
+def panflute_to_plain_markdown(elem: ListContainer) -> Optional[str]:
+    '''convert panflute to markdown in Python if it is plain
+
+    Plain means a single Plain or any number of Para, made of Str, Space and SoftBreak only,
+    where the text is plain (c.f. :func:`is_plain_markdown`) apart from characters that are always escaped.
+
+    :return: the same as pandoc's output, or None if elem is not plain
+    '''
+    if not elem:
+        return ''
+    if len(elem) > 1 or type(elem[0]) is not Plain:
+        for block in elem:
+            if type(block) is not Para:
+                return None
+    paras = []
+    for block in elem:
+        words: List[str] = []
+        space = True
+        for inline in block.content:
+            type_ = type(inline)
+            if type_ is Str:
+                if space:
+                    words.append(inline.text)
+                else:
+                    words[-1] += inline.text
+                space = False
+            elif type_ is Space or type_ is SoftBreak:
+                if space:
+                    return None
+                space = True
+            else:
+                return None
+        if space:
+            return None
+        text = ' '.join(words)
+        # an image ![ is escaped differently
+        if not is_plain_markdown(text.translate(_ESCAPES_CHECK)) or len(words) != len(text.split()) or '![' in text:
+            return None
+        text = text.translate(_ESCAPES)
+        # pandoc wraps long lines at spaces, assume non-ASCII characters are wide
+        if len(words) > 1 and len(text) + sum(ord(char) > 127 for char in text) > COLUMNS:
+            return None
+        paras.append(text)
+    return '\n\n'.join(paras)
+
+
+#: markdown resolved across the whole document rather than within a text:
+#: footnotes and reference links, citations and example lists by `[` and `@`,
+#: and the identifiers of ATX and setext headers
+_RE_MARKDOWN_DEPENDENT = re.compile(r'[\[@]|^ {0,3}(?:#|[=-]+[ \t]*$)', re.MULTILINE)
+
+
+def is_markdown_independent(text: str) -> bool:
+    '''check if converting markdown text to panflute gives the same result whatever is converted with it
+
+    This is conservative, i.e. some independent texts are not detected.
+    '''
+    return _RE_MARKDOWN_DEPENDENT.search(text) is None
+
+
+def is_panflute_independent(elem: Union[ListContainer, str]) -> bool:
+    '''check if converting blocks to markdown gives the same result whatever is converted with them
+
+    Footnotes are numbered across the whole document.
+
+    :param elem: the blocks, or serialized by `_dump_blocks`
+    '''
+    return '"t": "Note"' not in (elem if type(elem) is str else _dump_blocks(elem))
+
+
+def _convert_texts_markdown_to_panflute(
     texts: Iterable[str],
     extra_args: Optional[List[str]] = None,
 ) -> Iterator[ListContainer]:
-    '''a faster, specialized convert_texts
-    '''
     # put each text in a Div together
     text = '\n\n'.join(
         (
@@ -74,17 +326,44 @@ def iter_convert_texts_markdown_to_panflute(
     return (elem.content for elem in pf)
 
 
-def iter_convert_texts_panflute_to_markdown(
-    elems: Iterable[ListContainer],
+def iter_convert_texts_markdown_to_panflute(
+    texts: Iterable[str],
     extra_args: Optional[List[str]] = None,
-    seperator: str = np.random.randint(65, 91, size=256, dtype=np.uint8).view('S256')[0].decode(),
-) -> Iterator[str]:
+) -> Iterator[ListContainer]:
     '''a faster, specialized convert_texts
 
-    :param list elems: must be list of ListContainer of Block.
-        This is more restrictive than convert_texts which can also accept list of Block
-    :param str seperator: a string for seperator in the temporary markdown output
+    plain texts are converted in Python, c.f. :func:`plain_markdown_to_panflute`.
+    Others are cached, see :func:`pantable.cache.get_cache`,
+    unless their results depend on each other, c.f. :func:`is_markdown_independent`
     '''
+    texts = list(texts)
+    convert = partial(
+        _convert_unique,
+        convert=partial(
+            _convert_cached,
+            input_format='markdown',
+            output_format='panflute',
+            extra_args=extra_args,
+            convert=partial(_convert_texts_markdown_to_panflute, extra_args=extra_args),
+            dump=_dump_blocks,
+            load=_load_blocks,
+            independent=is_markdown_independent,
+        ),
+        independent=is_markdown_independent,
+        # AST is mutable, each repeated text gets its own copy
+        copy=_copy_blocks,
+    )
+    # extra_args may change how pandoc reads markdown
+    if extra_args:
+        return iter(convert(texts))
+    return iter(_convert_fast(texts, convert, plain_markdown_to_panflute))
+
+
+def _convert_texts_panflute_to_markdown(
+    elems: Iterable[ListContainer],
+    extra_args: Optional[List[str]] = None,
+    seperator: str = np.random.randint(65, 91, size=256, dtype=np.uint8).view('S256')[0].decode(),
+) -> Iterator[str]:
     def iter_seperator(elems: List[ListContainer], inserter: Para):
         '''insert between every element in a ListContainer'''
         for elem in elems:
@@ -108,11 +387,67 @@ def iter_convert_texts_panflute_to_markdown(
     inserter = Para(Str(seperator))
 
     elems_inserted = ListContainer(*iter_seperator(elems, inserter))
-    # reference-location=block for footnotes, see issue #58
-    texts_converted = convert_text(elems_inserted, input_format='panflute', output_format='markdown', extra_args=['--reference-location=block'])
+    texts_converted = convert_text(elems_inserted, input_format='panflute', output_format='markdown', extra_args=extra_args)
     return iter_split_by_seperator(texts_converted, seperator)
 
 
+def iter_convert_texts_panflute_to_markdown(
+    elems: Iterable[ListContainer],
+    extra_args: Optional[List[str]] = None,
+    seperator: str = np.random.randint(65, 91, size=256, dtype=np.uint8).view('S256')[0].decode(),
+) -> Iterator[str]:
+    '''a faster, specialized convert_texts
+
+    plain elements are converted in Python, c.f. :func:`panflute_to_plain_markdown`.
+    Others are cached, see :func:`pantable.cache.get_cache`,
+    unless their results depend on each other, c.f. :func:`is_panflute_independent`
+
+    :param list elems: must be list of ListContainer of Block.
+        This is more restrictive than convert_texts which can also accept list of Block
+    :param str seperator: a string for seperator in the temporary markdown output
+    '''
+    # reference-location=block for footnotes, see issue #58
+    extra_args = ['--reference-location=block']
+    convert = partial(
+        _convert_unique,
+        convert=partial(
+            _convert_cached,
+            input_format='panflute',
+            output_format='markdown',
+            extra_args=extra_args,
+            convert=partial(_convert_texts_panflute_to_markdown, extra_args=extra_args, seperator=seperator),
+            dump=str,
+            load=str,
+            independent=is_panflute_independent,
+        ),
+        independent=is_panflute_independent,
+        to_text=_dump_blocks,
+    )
+    return iter(_convert_fast(list(elems), convert, panflute_to_plain_markdown))
+
+
+def convert_groups(
+    groups: List[List[Any]],
+    convert: Callable[[Iterable[Any]], Iterator[Any]],
+    independent: Callable[[Any], bool],
+) -> List[List[Any]]:
+    '''convert groups of inputs, such as the cells of many tables, as if each group is converted on its own
+
+    The groups of independent inputs only are converted together in one batch,
+    the others each in its own batch, so that what pandoc resolves across a batch,
+    such as footnotes and reference links, stays within a group.
+
+    :param convert: batch convert inputs to outputs
+    :param independent: if the output of an input is independent of the others converted with it
+    '''
+    shared = [all(map(independent, group)) for group in groups]
+    outputs = iter(convert(chain.from_iterable(group for group, shared_ in zip(groups, shared) if shared_)))
+    return [
+        [next(outputs) for _ in group] if shared_ else list(convert(group))
+        for group, shared_ in zip(groups, shared)
+    ]
+
+
 convert_texts_func: Dict[Tuple[str, str], Callable[[Iterable, Optional[List[str]]], Iterator]] = {
     ('markdown', 'panflute'): (
         lambda *args, **kwargs:
@@ -1,7 +1,8 @@
 import numpy as np
 from pytest import mark
 
-from pantable.ast import Align, PanTableOption
+from pantable.ast import Align, Ica, PanTableOption
+from pantable.util import convert_texts
 
 
 @mark.parametrize('kwargs1,kwargs2', (
@@ -25,6 +26,14 @@ from pantable.ast import Align, PanTableOption
         {'table_width': '2/3'},
         {'table_width': 2 / 3},
     ),
+    (
+        {'columns': ['name']},
+        {'columns': 'name'},
+    ),
+    (
+        {'columns': [2]},
+        {'columns': 2},
+    ),
 ))
 def test_pantableoption_type(kwargs1, kwargs2):
     assert PanTableOption(**kwargs1) == PanTableOption(**kwargs2)
@@ -213,3 +222,58 @@ def test_align_text_2D():
 
     assert Align.from_aligns_text(aligns_text) == aligns
     assert Align.from_aligns_string(aligns_string) == aligns
+
+
+@mark.parametrize('text', (
+    '[]{#a}',
+    '[]{.b #c key=val k2="q \\" w" .d}',
+    '[]{ #a  .b }',
+    '[]{#a #b}',
+    '[]{#a.b .1 .c}',
+    "[]{id=x class='a b' k=v k=w}",
+    '[]{- #é k="a\\\\b" k2=a\\"b k3=}',
+    '[]{foo}',
+))
+def test_ica_from_markdown(text):
+    ica = Ica.from_markdown(text)
+    ica_pandoc = Ica.from_panflute_ast(convert_texts([text])[0])
+    if ica is None:
+        assert ica_pandoc == Ica()
+    else:
+        assert ica == ica_pandoc
+        assert list(ica.attributes) == list(ica_pandoc.attributes)
+
+
+@mark.parametrize('ica,text', (
+    (Ica(), ''),
+    (Ica('a', ['b', 'c']), '[]{#a .b .c}'),
+    (Ica('', [], {'k': 'a"b\\c d'}), '[]{k="a\\"b\\\\c d"}'),
+    (Ica('a b'), None),
+    (Ica('a', [f'c{i}' for i in range(30)]), None),
+))
+def test_ica_to_markdown(ica, text):
+    assert ica.to_markdown() == text
+    if text is not None:
+        assert text == convert_texts([ica.to_panflute_ast()], input_format='panflute', output_format='markdown')[0]
+
+
+def test_empty_icas_not_converted(monkeypatch):
+    import pantable.ast
+    from pantable.ast import PanCodeBlock, PanTable
+
+    texts = []
+    convert_orig = pantable.ast.iter_convert_texts_markdown_to_panflute
+
+    def convert_recorded(texts_):
+        texts_ = list(texts_)
+        texts.extend(texts_)
+        return convert_orig(texts_)
+
+    monkeypatch.setattr(pantable.ast, 'iter_convert_texts_markdown_to_panflute', convert_recorded)
+    pan_table_markdown = PanCodeBlock(data='**a**,b\nc,d', options=PanTableOption(markdown=True)).to_pantablestr()
+    pan_table = pan_table_markdown.to_pantable()
+    # captions and cells only
+    assert texts == ['', '', '**a**', 'b', 'c', 'd']
+    assert all(ica == Ica() for ica in pan_table.icas.flat)
+    assert all(ica == Ica() for ica in pan_table.icas_row)
+    assert all(ica == '' for ica in PanTable.to_pantablemarkdown(pan_table).icas.flat)
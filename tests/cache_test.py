@@ -0,0 +1,91 @@
+from panflute.tools import convert_text
+from pytest import fixture
+
+import pantable.cache
+import pantable.util
+from pantable.cache import ConversionCache, get_cache, set_cache
+from pantable.util import (eq_panflute_elems, iter_convert_texts_markdown_to_panflute,
+                           iter_convert_texts_panflute_to_markdown)
+
+TEXTS = ['some **markdown**', 'and ~~some~~ *emphasis*', '']
+
+
+@fixture
+def cache(tmp_path):
+    cache_orig = get_cache()
+    cache = ConversionCache(tmp_path / 'conversions.sqlite')
+    set_cache(cache)
+    yield cache
+    set_cache(cache_orig)
+
+
+@fixture
+def count_calls(monkeypatch):
+    calls = []
+    convert_text_orig = pantable.util.convert_text
+
+    def convert_text_counted(*args, **kwargs):
+        calls.append(args)
+        return convert_text_orig(*args, **kwargs)
+
+    monkeypatch.setattr(pantable.util, 'convert_text', convert_text_counted)
+    return calls
+
+
+def test_cache_roundtrip(cache, count_calls):
+    elems = list(iter_convert_texts_markdown_to_panflute(TEXTS))
+    texts = list(iter_convert_texts_panflute_to_markdown(elems))
+    assert len(count_calls) == 2
+
+    # warm cache: no pandoc call
+    elems_cached = list(iter_convert_texts_markdown_to_panflute(TEXTS))
+    assert list(iter_convert_texts_panflute_to_markdown(elems_cached)) == texts
+    assert len(count_calls) == 2
+    for elem, elem_cached in zip(elems, elems_cached):
+        assert eq_panflute_elems(elem, elem_cached)
+    assert eq_panflute_elems(elems_cached[0], convert_text(TEXTS[0]))
+
+    # only the new text is converted
+    assert len(list(iter_convert_texts_markdown_to_panflute(TEXTS + ['*new*']))) == 4
+    assert len(count_calls) == 3
+    assert count_calls[-1][0].count('PanTableDiv') == 1
+
+
+def test_cache_evict(tmp_path):
+    cache = ConversionCache(tmp_path / 'conversions.sqlite', max_size=10)
+    cache.set_many({'a': '12345'})
+    cache.set_many({'b': '1234567'})
+    assert cache.get_many(['a', 'b']) == {'b': '1234567'}
+    cache.clear()
+    assert cache.get_many(['b']) == {}
+
+
+def test_cache_disabled(monkeypatch, count_calls):
+    monkeypatch.setenv('PANTABLECACHE', '0')
+    monkeypatch.setattr(pantable.cache, '_cache', False)
+    assert get_cache() is None
+    for _ in range(2):
+        elems = list(iter_convert_texts_markdown_to_panflute(TEXTS))
+        assert list(iter_convert_texts_panflute_to_markdown(elems))
+    # every conversion calls pandoc
+    assert len(count_calls) == 4
+    assert eq_panflute_elems(elems[0], convert_text(TEXTS[0]))
+
+
+def test_cache_dependent(cache, count_calls):
+    '''test texts resolved across the batch are never cached
+    '''
+    for url in ('http://a.example', 'http://b.example'):
+        elems = list(iter_convert_texts_markdown_to_panflute(['[foo]', f'[foo]: {url}']))
+        assert elems[0][0].content[0].url == url
+    assert len(count_calls) == 2
+
+    # footnotes are numbered across the batch
+    def roundtrip(texts):
+        return list(iter_convert_texts_panflute_to_markdown(iter_convert_texts_markdown_to_panflute(texts)))
+
+    roundtrip(['x[^1]\n\n[^1]: one'])
+    texts = roundtrip(['x[^1]\n\n[^1]: one', 'q[^1]\n\n[^1]: two'])
+    assert texts[0].startswith('x[^1]') and texts[1].startswith('q[^2]')
+    set_cache(None)
+    assert roundtrip(['x[^1]\n\n[^1]: one', 'q[^1]\n\n[^1]: two']) == texts
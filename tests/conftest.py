@@ -0,0 +1,15 @@
+from pytest import fixture
+
+import pantable.cache
+import pantable.io
+
+
+@fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    '''point the caches at a fresh directory per test, instead of the cache of the user
+    '''
+    monkeypatch.setenv('PANTABLECACHE', str(tmp_path / 'pantable-cache'))
+    # re-initialized from the env. var. on first use
+    monkeypatch.setattr(pantable.cache, '_cache', False)
+    monkeypatch.setattr(pantable.cache, '_include_cache', False)
+    monkeypatch.setattr(pantable.io, '_includes', {})
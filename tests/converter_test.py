@@ -0,0 +1,116 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from panflute.tools import convert_text
+from pytest import fixture, raises
+
+from pantable.converter import FallbackConverter, ServerConverter, SubprocessConverter
+from pantable.util import eq_panflute_elems
+
+TEXT = '''some **markdown** here[^1]
+
+[^1]: and ~~some~~ footnote'''
+
+
+class PandocServerHandler(BaseHTTPRequestHandler):
+    '''emulate the API of pandoc server by a pandoc subprocess'''
+
+    converter = SubprocessConverter()
+
+    def _respond(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(200, b'"3"')
+
+    def do_POST(self):
+        options = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        text = options.pop('text')
+        input_format = options.pop('from')
+        output_format = options.pop('to')
+        # pandoc server rejects option values of the wrong JSON types, and some options
+        if not isinstance(options.get('columns', 0), int) or 'eol' in options:
+            self._respond(400, b'invalid options')
+            return
+        extra_args = [f'--{key}' if value is True else f'--{key}={value}' for key, value in options.items()]
+        output = self.converter.convert_raw(text, input_format, output_format, extra_args)
+        self._respond(200, json.dumps({'output': output, 'base64': False, 'messages': []}).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PandocServerHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@fixture(scope='module')
+def server_url():
+    server = start_server()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_subprocess_converter():
+    converter = SubprocessConverter()
+    elems = converter.convert_text(TEXT)
+    assert eq_panflute_elems(elems, convert_text(TEXT))
+    assert converter.convert_text(elems, input_format='panflute', output_format='markdown') == convert_text(elems, input_format='panflute', output_format='markdown')
+
+
+def test_server_converter(server_url):
+    converter = ServerConverter(server_url)
+    elems = converter.convert_text(TEXT)
+    assert eq_panflute_elems(elems, convert_text(TEXT))
+    args = ['--reference-location=block']
+    assert converter.convert_text(elems, input_format='panflute', output_format='markdown', extra_args=args) == convert_text(elems, input_format='panflute', output_format='markdown', extra_args=args)
+
+
+def test_server_converter_fallback():
+    with raises(OSError):
+        ServerConverter('http://127.0.0.1:1', timeout=0.1)
+    server = start_server()
+    converter = FallbackConverter(ServerConverter(f'http://127.0.0.1:{server.server_address[1]}'), SubprocessConverter())
+    # a server that stopped responding
+    server.shutdown()
+    server.server_close()
+    # a broken server converter falls back to subprocess
+    assert eq_panflute_elems(converter.convert_text(TEXT), convert_text(TEXT))
+    assert converter.converter is None
+
+
+def test_server_converter_args(server_url):
+    assert ServerConverter._parse_args(['--columns=80', '--wrap=none', '--standalone', '--dpi=96.5', '--toc=false']) == {
+        'columns': 80,
+        'wrap': 'none',
+        'standalone': True,
+        'dpi': 96.5,
+        'toc': False,
+    }
+    elems = convert_text(TEXT)
+    args = ['--columns=20']
+    converter = FallbackConverter(ServerConverter(server_url), SubprocessConverter())
+    assert converter.convert_text(elems, input_format='panflute', output_format='markdown', extra_args=args) == convert_text(elems, input_format='panflute', output_format='markdown', extra_args=args)
+    # an error response falls back for that conversion only
+    args = ['--eol=lf']
+    assert converter.convert_text(elems, input_format='panflute', output_format='markdown', extra_args=args) == convert_text(elems, input_format='panflute', output_format='markdown', extra_args=args)
+    assert converter.converter is not None
+
+
+def test_init_worker(server_url, monkeypatch):
+    '''test the workers of the parallel mode never start a pandoc server, c.f. `codeblocks_to_tables_parallel`
+    '''
+    import pantable.converter
+    from pantable.codeblock_to_table import _init_worker
+
+    monkeypatch.setenv('PANTABLECONVERTER', 'server')
+    monkeypatch.setattr(pantable.converter, '_converter', ServerConverter(server_url))
+    _init_worker()
+    assert type(pantable.converter.get_converter()) is SubprocessConverter
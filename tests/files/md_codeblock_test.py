@@ -45,3 +45,49 @@ def read_io(name: str) -> Tuple[str, str]:
 def test_md_codeblock(name):
     res = read_io(name)
     assert res[0].strip() == res[1].strip()
+
+
+def test_md_codeblock_batch():
+    '''test batch mode of the cli has identical result for a document of many tables
+    '''
+    from pantable.cli.pantable import main
+
+    text = '\n\n'.join(path.read_text() for path in sorted(DIRS[0].glob(f'*.{EXT}')))
+    # footnote labels and references clashing between tables
+    text += '\n\n' + '\n\n'.join(
+        f'''``` table
+---
+markdown: true
+...
+a,b
+"x[^1]
+
+[^1]: {note}","[link]
+
+[link]: http://{note}.example"
+```'''
+        for note in ('one', 'two')
+    )
+    mds = []
+    for batch in (False, True):
+        doc = convert_text(text, standalone=True)
+        doc.metadata['pantable-batch'] = batch
+        main(doc)
+        mds.append(convert_text(doc, input_format='panflute', output_format='markdown'))
+    assert mds[0] == mds[1]
+
+
+@mark.parametrize('parallel', ('1', '2'))
+def test_md_codeblock_parallel(parallel):
+    '''test parallel mode of the cli has identical result for a document of many tables
+    '''
+    from pantable.cli.pantable import main
+
+    text = '\n\n'.join(path.read_text() for path in sorted(DIRS[0].glob(f'*.{EXT}')))
+    mds = []
+    for parallel_ in ('false', parallel):
+        doc = convert_text(text, standalone=True)
+        doc.metadata['pantable-parallel'] = parallel_
+        main(doc)
+        mds.append(convert_text(doc, input_format='panflute', output_format='markdown'))
+    assert mds[0] == mds[1]
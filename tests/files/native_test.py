@@ -94,3 +94,83 @@ def read_table_to_codeblock_str(path: Path):
 def test_table_to_codeblock_str(name):
     path = DIRS[0] / f'{name}.{EXTs[0]}'
     read_table_to_codeblock_str(path)
+
+
+@mark.parametrize('fancy_table', (False, True))
+def test_table_to_codeblock_batch(fancy_table: bool):
+    '''test batch mode of the cli has identical result for a document of many tables
+    '''
+    from pantable.cli.pantable2csv import main as main_csv
+    from pantable.cli.pantable2csvx import main as main_csvx
+
+    main = main_csvx if fancy_table else main_csv
+    mds = []
+    for batch in (False, True):
+        doc = convert_text('', standalone=True)
+        for path in sorted(DIRS[0].glob(f'*.{EXTs[0]}')):
+            with open(path, 'r') as f:
+                doc.content.extend(convert_text(f.read(), input_format='native'))
+        doc.metadata['pantable-batch'] = batch
+        main(doc)
+        mds.append(convert_text(doc, input_format='panflute', output_format='markdown'))
+    assert mds[0] == mds[1]
+
+
+@mark.parametrize('batch', (False, True))
+def test_table_to_codeblock_export(tmp_path, batch: bool):
+    '''test the exported tables are read back identically, with a manifest of their checksums
+
+    and exporting again to the same directory keeps the unchanged files and the manifest.
+    '''
+    import hashlib
+    import json
+
+    from pantable.cli.pantable import main as main_table
+    from pantable.cli.pantable2csv import main as main_csv
+
+    mds = []
+    mtimes = []
+    for export_dir in ('', tmp_path, tmp_path):
+        doc = convert_text('', standalone=True)
+        for path in sorted(DIRS[0].glob(f'*.{EXTs[0]}')):
+            with open(path, 'r') as f:
+                doc.content.extend(convert_text(f.read(), input_format='native'))
+        doc.metadata['pantable-batch'] = batch
+        if export_dir:
+            doc.metadata['pantable-export-dir'] = str(export_dir)
+        main_csv(doc)
+        if export_dir:
+            mtimes.append({path.name: path.stat().st_mtime_ns for path in tmp_path.glob('*.*')})
+        main_table(doc)
+        mds.append(convert_text(doc, input_format='panflute', output_format='markdown'))
+    assert mds[0] == mds[1] == mds[2]
+    assert 'manifest.json' in mtimes[0] and mtimes[0] == mtimes[1]
+
+    with open(tmp_path / 'manifest.json', 'r') as f:
+        manifest = json.load(f)['tables']
+    assert [table['index'] for table in manifest] == list(range(len(list(DIRS[0].glob(f'*.{EXTs[0]}')))))
+    for table in manifest:
+        assert hashlib.sha256((tmp_path / table['path']).read_bytes()).hexdigest() == table['sha256']
+        assert table['options']['include'] == str(tmp_path / table['path'])
+
+
+def test_table_to_codeblock_export_overwrite(tmp_path, monkeypatch):
+    '''test the export follows env. var. PANTABLEOVERWRITE
+    '''
+    import pantable.io
+    from pantable.cli.pantable2csv import main as main_csv
+
+    monkeypatch.setenv('PANTABLEOVERWRITE', 'never')
+    monkeypatch.setattr(pantable.io, '_overwrite', None)
+    mtimes = []
+    for _ in range(2):
+        doc = convert_text('', standalone=True)
+        for path in sorted(DIRS[0].glob(f'*.{EXTs[0]}')):
+            with open(path, 'r') as f:
+                doc.content.extend(convert_text(f.read(), input_format='native'))
+        doc.metadata['pantable-export-dir'] = str(tmp_path)
+        main_csv(doc)
+        mtimes.append({path.name: path.stat().st_mtime_ns for path in tmp_path.glob('*.*')})
+    assert 'manifest.json' in mtimes[0] and mtimes[0] == mtimes[1]
+    # existing files are never overwritten, so the tables are kept in the code blocks
+    assert 'include' not in convert_text(doc, input_format='panflute', output_format='markdown')
@@ -0,0 +1,608 @@
+import bz2
+import csv
+import io
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from pytest import fixture, importorskip, mark, raises
+
+import pantable.cache
+import pantable.io
+from pantable.ast import PanTableOption
+from pantable.cache import IncludeCache, get_include_cache, set_include_cache
+from pantable.io import (INDEX_SUFFIX, build_row_offsets, clear_includes, dump_csv, dump_csv_io, iter_lines_mmap,
+                         load_csv, load_csv_array, rows_to_array, write_csv)
+from pantable.util import EmptyTableError
+
+
+@fixture
+def include_cache(tmp_path):
+    cache_orig = get_include_cache()
+    cache = IncludeCache(tmp_path / 'includes')
+    set_include_cache(cache)
+    yield cache
+    set_include_cache(cache_orig)
+
+
+def to_array_naive(table_list):
+    m = len(table_list)
+    n = max(len(row) for row in table_list)
+    res = np.full((m, n), '', dtype=np.object_)
+    for i, row in enumerate(table_list):
+        for j, cell in enumerate(row):
+            res[i, j] = cell
+    return res
+
+
+@mark.parametrize('data', (
+    'a',
+    'a,b\nc,d',
+    'a\n\nb,c,d\n,e',
+    '\n'.join(','.join(str(i * j) for j in range(i % 13)) for i in range(1, 300)),
+))
+def test_load_csv_array(data):
+    options = PanTableOption()
+    res = load_csv_array(data, options)
+    assert res.dtype == np.object_
+    np.testing.assert_array_equal(res, to_array_naive(load_csv(data, options)))
+
+
+@mark.parametrize('rows', ([], [[]], [[], [' ', '']]))
+def test_rows_to_array_empty(rows):
+    with raises(EmptyTableError):
+        rows_to_array(rows)
+
+
+def test_rows_to_array_growth():
+    rows = [[str(i)] * (i % 20) for i in range(100)]
+    res = rows_to_array(rows, m_init=1, n_init=1)
+    assert res.shape == (100, 19)
+    np.testing.assert_array_equal(res, to_array_naive(rows))
+
+
+@mark.parametrize('chunk_size', (1, 2, 3, 7, 1 << 20))
+def test_iter_lines_mmap(tmp_path, chunk_size):
+    path = tmp_path / 'table.csv'
+    path.write_bytes('a,"b\r\nc"\r\né,中\rd\n\r\n\n"x\ry",z\r'.encode('utf-8') * 3 + b'no newline')
+    assert list(iter_lines_mmap(path, encoding='utf-8', chunk_size=chunk_size)) == list(open(path, encoding='utf-8', newline=''))
+
+
+def test_load_csv_array_mmap(tmp_path, monkeypatch):
+    path = tmp_path / 'table.csv'
+    path.write_text('a,"b\nc"\n1,2,3\n', encoding='utf-8')
+    options = PanTableOption(include=str(path), include_encoding='utf-8')
+    res = load_csv_array('', options)
+    monkeypatch.setattr(pantable.io, 'MMAP_THRESHOLD', 0)
+    np.testing.assert_array_equal(load_csv_array('', options), res)
+
+
+def test_row_offsets(tmp_path):
+    path = tmp_path / 'table.csv'
+    rows = [['a', 'b\r\nc'], [], ['é', '中\n'], ['1', '2', '3']]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(rows * 5)
+    offsets = build_row_offsets(path, encoding='utf-8')
+    assert offsets.size == len(rows) * 5 + 1
+    data = path.read_bytes()
+    assert offsets[-1] == len(data)
+    for i, row in enumerate(rows * 5):
+        assert list(csv.reader(io.StringIO(data[offsets[i]:offsets[i + 1]].decode('utf-8'), newline=''))) == [row]
+
+
+@mark.parametrize('rows', (slice(None), slice(3, 9), slice(-5, None), slice(1, None, 3), slice(None, None, -2), slice(7, 3)))
+def test_load_csv_array_rows(tmp_path, rows):
+    path = tmp_path / 'table.csv'
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows([str(i), f'"{i}\n{i}"'] for i in range(12))
+    options = PanTableOption(include=str(path), include_encoding='utf-8', header=False)
+    options_index = PanTableOption(include=str(path), include_encoding='utf-8', header=False, include_index=True)
+    expected = load_csv_array('', options)[rows]
+    if not expected.size:
+        for options_ in (options, options_index):
+            with raises(EmptyTableError):
+                load_csv_array('', options_, rows=rows)
+    else:
+        np.testing.assert_array_equal(load_csv_array('', options, rows=rows), expected)
+        np.testing.assert_array_equal(load_csv_array('', options_index, rows=rows), expected)
+        assert Path(f'{path}{INDEX_SUFFIX}').is_file()
+
+
+def test_row_index_invalidated(tmp_path):
+    path = tmp_path / 'table.csv'
+    path.write_text('a\nb\nc\n', encoding='utf-8')
+    options = PanTableOption(include=str(path), include_encoding='utf-8', header=False, include_index=True)
+    np.testing.assert_array_equal(load_csv_array('', options, rows=slice(-1, None)), [['c']])
+    path.write_text('a\nb\nc\nlonger\n', encoding='utf-8')
+    np.testing.assert_array_equal(load_csv_array('', options, rows=slice(-1, None)), [['longer']])
+
+
+@mark.parametrize('kwargs', (
+    {'rows': [2, 8]},
+    {'rows': [-6, None], 'head': 3},
+    {'head': 4, 'tail': 2},
+    {'tail': 3},
+    {'tail': 0},
+    {'rows': [None, -2], 'tail': 20},
+    {'columns': ['b', 0]},
+    {'columns': [2, 'missing'], 'head': 1},
+    {'columns': ['b'], 'header': False, 'tail': 1},
+))
+@mark.parametrize('mode', ('parse', 'index', 'cache'))
+def test_load_csv_array_options(tmp_path, kwargs, mode):
+    cache_orig = get_include_cache()
+    set_include_cache(IncludeCache(tmp_path / 'includes') if mode == 'cache' else None)
+    path = tmp_path / 'table.csv'
+    table = [['a', 'b', 'c']] + [[str(i), str(-i)] for i in range(10)]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(table)
+    try:
+        # while reading
+        _test_load_csv_array_options(path, table, kwargs, include_index=mode == 'index')
+        # from the registry, after a full load
+        load_csv_array('', PanTableOption(include=str(path), include_encoding='utf-8'))
+        _test_load_csv_array_options(path, table, kwargs, include_index=mode == 'index')
+        # from the include cache
+        clear_includes()
+        _test_load_csv_array_options(path, table, kwargs, include_index=mode == 'index')
+    finally:
+        set_include_cache(cache_orig)
+
+
+def _test_load_csv_array_options(path, table, kwargs, include_index):
+    options = PanTableOption(include=str(path), include_encoding='utf-8', include_index=include_index, **kwargs)
+
+    # reference: load everything, then select
+    res = to_array_naive(table)
+    header = options.header
+    idxs = range(int(header), len(table))
+    for slice_ in options.row_slices() or ():
+        idxs = idxs[slice_]
+    res = res[([0] if header else []) + list(idxs)]
+    if options.columns is not None:
+        res = res[:, [0 if j == 'a' else 1 if j == 'b' else j for j in options.columns if j != 'missing']]
+        if not header:
+            res = res[:, :0]
+    if not any(cell.strip() for cell in res.flat):
+        with raises(EmptyTableError):
+            load_csv_array('', options)
+    else:
+        np.testing.assert_array_equal(load_csv_array('', options), res)
+
+
+def test_include_cache(tmp_path, include_cache):
+    path = tmp_path / 'table.csv'
+    path.write_text('a\n\x1fb,c\n,,\n', encoding='utf-8')
+    options = PanTableOption(include=str(path), include_encoding='utf-8', header=False)
+    res = to_array_naive([['a'], ['\x1fb', 'c'], ['', '', '']])
+    for _ in range(2):
+        clear_includes()
+        np.testing.assert_array_equal(load_csv_array('', options), res)
+        # the width is of the selected rows only
+        np.testing.assert_array_equal(load_csv_array('', options, rows=slice(2)), res[:2, :2])
+        with raises(EmptyTableError):
+            load_csv_array('', options, rows=slice(2, None))
+    assert len(list(include_cache.path.glob('*.bin'))) == 1
+
+    # invalidated by changes and the stale entry is removed
+    path.write_text('d,e\n', encoding='utf-8')
+    np.testing.assert_array_equal(load_csv_array('', options), [['d', 'e']])
+    np.testing.assert_array_equal(load_csv_array('', options), [['d', 'e']])
+    assert len(list(include_cache.path.glob('*.bin'))) == 1
+
+
+def test_include_cache_chunks(tmp_path, include_cache, monkeypatch):
+    monkeypatch.setattr(pantable.cache, 'SAVE_CHUNK_ROWS', 3)
+    path = tmp_path / 'table.csv'
+    table = [[str(i), 'é' * i] for i in range(10)] + [['x\x1fy']]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(table)
+    options = PanTableOption(include=str(path), include_encoding='utf-8', header=False)
+    load_csv_array('', options)
+    clear_includes()
+    # from the include cache, with the separator not in the last chunk
+    np.testing.assert_array_equal(load_csv_array('', options, rows=slice(2, None, 4)), to_array_naive(table[2::4]))
+    assert pantable.io._includes[str(path.resolve())][1].sep != '\x1f'
+
+
+def test_include_cache_evict(tmp_path):
+    cache = IncludeCache(tmp_path / 'includes')
+    array = np.full((4, 4), 'abcdefghi', dtype=np.object_)
+    lengths = np.full(4, 4, dtype=np.int64)
+    paths = []
+    for k in range(3):
+        path = tmp_path / f'{k}.csv'
+        path.write_text('', encoding='utf-8')
+        paths.append(path)
+        cache.save(path, path.stat(), 'utf-8', {}, array, lengths)
+        if k == 0:
+            # room for 2 entries
+            size = sum(path_.stat().st_size for path_ in cache.path.iterdir())
+            cache.max_size = 2 * size + size // 2
+        # the 1st is recently used, beyond the resolution of mtime
+        time.sleep(0.05)
+        cache.load(paths[0], paths[0].stat(), 'utf-8', {})
+        time.sleep(0.05)
+    assert [cache.load(path, path.stat(), 'utf-8', {}) is not None for path in paths] == [True, False, True]
+    # too large to be cached
+    cache.max_size = 100
+    cache.clear()
+    cache.save(paths[0], paths[0].stat(), 'utf-8', {}, array, lengths)
+    assert not list(cache.path.iterdir())
+
+
+def test_include_selection_streamed(tmp_path, include_cache):
+    path = tmp_path / 'table.csv'
+    path.write_text('a,b\nc,d\ne,f\n', encoding='utf-8')
+    clear_includes()
+    for kwargs in ({'tail': 1}, {'columns': ['b']}):
+        options = PanTableOption(include=str(path), include_encoding='utf-8', **kwargs)
+        load_csv_array('', options)
+    # only full loads are kept
+    assert not pantable.io._includes
+    assert not list(include_cache.path.iterdir())
+    load_csv_array('', PanTableOption(include=str(path), include_encoding='utf-8'))
+    assert pantable.io._includes
+    assert list(include_cache.path.glob('*.bin'))
+
+
+def test_include_registry(tmp_path):
+    cache_orig = get_include_cache()
+    set_include_cache(None)
+    try:
+        path = tmp_path / 'table.csv'
+        path.write_text('a,b\nc,d\ne,f\n', encoding='utf-8')
+        options = PanTableOption(include=str(path), include_encoding='utf-8', header=False)
+        res = load_csv_array('', options)
+        res_tail = load_csv_array('', PanTableOption(include=str(path), include_encoding='utf-8', header=False, tail=1))
+        # views of the same parsed array
+        assert np.shares_memory(res, res_tail)
+        np.testing.assert_array_equal(res_tail, [['e', 'f']])
+        with raises(ValueError):
+            res[0, 0] = 'x'
+
+        path.write_text('g\n', encoding='utf-8')
+        np.testing.assert_array_equal(load_csv_array('', options), [['g']])
+    finally:
+        set_include_cache(cache_orig)
+
+
+@mark.parametrize('ext', ('parquet', 'feather'))
+def test_arrow_roundtrip(tmp_path, ext):
+    importorskip('pyarrow')
+    from pantable.io import dump_arrow_io, load_arrow_array
+
+    table = [['a', 'b', 'c']] + [[str(i), str(-i), '' if i % 3 else 'x'] for i in range(10)]
+    data = to_array_naive(table)
+    path = tmp_path / f'table.{ext}'
+    options = PanTableOption(include=str(path))
+    assert options.format == ext
+    assert dump_arrow_io(data, options) == ''
+    np.testing.assert_array_equal(load_arrow_array('', options), data)
+    # cannot overwrite, falling back to CSV in the code block
+    options = PanTableOption(include=str(path))
+    assert dump_arrow_io(data, options) == dump_csv(data, options)
+    assert options.include == '' and options.format == 'csv'
+
+    options = PanTableOption(include=str(path), header=False, rows=[2, 8], tail=2, columns=['c', 0])
+    np.testing.assert_array_equal(load_arrow_array('', options), data[[7, 8]][:, [2, 0]])
+
+
+def test_format_inferred():
+    assert PanTableOption(include='table.parquet').format == 'parquet'
+    assert PanTableOption(include=['table.json.gz', 'table.csv']).format == 'json'
+    # explicit format is kept, and kept in kwargs only if it differs from the inferred
+    for include, format in (('table.json', 'csv'), ('table.db', 'csv'), ('table.parquet', 'feather'), ('table.csv', 'csv')):
+        options = PanTableOption(include=include, format=format)
+        assert options.format == format
+        assert PanTableOption.from_kwargs(**options.kwargs) == options
+    assert 'format' not in PanTableOption(include='table.json', format='json').kwargs
+    assert 'format' in PanTableOption(include='table.json', format='csv').kwargs
+
+
+def test_arrow_without_include():
+    from pantable.codeblock_to_table import codeblock_to_table
+
+    # shown as is instead of raising
+    assert codeblock_to_table(options={'format': 'parquet'}, data='a,b\n') is None
+
+
+def test_parquet_row_groups(tmp_path):
+    importorskip('pyarrow')
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from pantable.io import load_arrow_array
+
+    path = tmp_path / 'table.parquet'
+    pq.write_table(pa.table({'x': list(range(100)), 'y': [None, 1.5] * 50}), path, row_group_size=7)
+    options = PanTableOption(include=str(path), columns=['y', 'x'])
+    res = load_arrow_array('', options, rows=[slice(30, 60), slice(None, None, -11)])
+    np.testing.assert_array_equal(res, [['y', 'x'], ['1.5', '59'], ['', '48'], ['1.5', '37']])
+
+
+JSON_RECORDS = [
+    {'a': 1, 'b': 'x'},
+    {'b': None, 'c': [1, 'é']},
+    ['p', 'q', 'r', 's'],
+    True,
+]
+JSON_TABLE = [
+    ['a', 'b', 'c'],
+    ['1', 'x'],
+    ['', '', '[1, "é"]'],
+    ['p', 'q', 'r', 's'],
+    ['true'],
+]
+
+
+@mark.parametrize('format', ('jsonl', 'json'))
+def test_load_json_array(tmp_path, format):
+    from pantable.io import load_json_array
+
+    if format == 'jsonl':
+        text = '\n'.join(json.dumps(record) for record in JSON_RECORDS) + '\n\n'
+    else:
+        text = json.dumps(JSON_RECORDS, indent=2)
+    options = PanTableOption(format=format)
+    np.testing.assert_array_equal(load_json_array(text, options), to_array_naive(JSON_TABLE))
+
+    path = tmp_path / f'table.{format}'
+    path.write_text(text, encoding='utf-8')
+    options = PanTableOption(include=str(path), include_encoding='utf-8', header=False, tail=3, columns=['c', 0])
+    assert options.format == format
+    # the keys are from all records, whether selected or not
+    np.testing.assert_array_equal(load_json_array('', options), [['[1, "é"]', ''], ['r', 'p'], ['', 'true']])
+    options = PanTableOption(include=str(path), include_encoding='utf-8', head=1)
+    np.testing.assert_array_equal(load_json_array('', options), [['a', 'b', 'c'], ['1', 'x', '']])
+
+
+def test_load_json_array_invalid():
+    from pantable.io import load_json_array
+
+    # invalid lines are skipped
+    np.testing.assert_array_equal(load_json_array('{"a": 1}\n{"a": \n', PanTableOption(format='jsonl')), [['a'], ['1']])
+    with raises(ValueError):
+        load_json_array('[{"a": 1} {"a": 2}]', PanTableOption(format='json'))
+    with raises(EmptyTableError):
+        load_json_array('[]', PanTableOption(format='json'))
+
+
+def test_json_invalid_codeblock():
+    from pantable.codeblock_to_table import codeblock_to_table
+
+    # shown as is instead of raising
+    assert codeblock_to_table(options={'format': 'json'}, data='[{"a": 1} {"a": 2}]') is None
+    assert codeblock_to_table(options={'format': 'json'}, data='{"a": 1}') is None
+
+
+def test_load_sqlite_array(tmp_path):
+    import sqlite3
+
+    from pantable.io import _sqlite_connections, load_sqlite_array
+
+    path = tmp_path / 'data.db'
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute('CREATE TABLE t (x INTEGER, y TEXT, z REAL)')
+        conn.executemany('INSERT INTO t VALUES (?, ?, ?)', [(i, None if i % 2 else f'y{i}', i / 4) for i in range(3000)])
+    conn.close()
+
+    options = PanTableOption(include=str(path), query='SELECT * FROM t WHERE x < 4 ORDER BY x DESC')
+    assert options.format == 'sqlite'
+    np.testing.assert_array_equal(
+        load_sqlite_array('', options),
+        [['x', 'y', 'z'], ['3', '', '0.75'], ['2', 'y2', '0.5'], ['1', '', '0.25'], ['0', 'y0', '0.0']],
+    )
+    # connection reused
+    assert len(_sqlite_connections) == 1
+
+    options = PanTableOption(include=str(path), query='SELECT x, y FROM t', header=False, rows=[2000, None], head=2, columns=['y', 0, 5])
+    np.testing.assert_array_equal(load_sqlite_array('', options), [['y2000', '2000', ''], ['', '2001', '']])
+
+    with raises(ValueError):
+        load_sqlite_array('', PanTableOption(include=str(path), query='SELECT * FROM missing'))
+    with raises(ValueError):
+        load_sqlite_array('', PanTableOption(include=str(path), query='DELETE FROM t'))
+    with raises(EmptyTableError):
+        load_sqlite_array('', PanTableOption(include=str(path), query='SELECT * FROM t WHERE x < 0', header=False))
+
+
+def test_sqlite_filter(tmp_path):
+    import sqlite3
+
+    from panflute import CodeBlock, Table, convert_text
+
+    from pantable.cli.pantable import main
+
+    path = tmp_path / 'data.db'
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute('CREATE TABLE t (x INTEGER, y TEXT)')
+        conn.execute("INSERT INTO t VALUES (1, 'a')")
+    conn.close()
+    queries = ('SELECT * FROM t', '', 'SELECT * FROM', 'SELECT * FROM missing')
+    text = '\n\n'.join(
+        f'```table\n---\ninclude: {path}\n' + (f'query: {query}\n' if query else '') + '...\n```'
+        for query in queries
+    )
+    doc = convert_text(text, standalone=True)
+    main(doc)
+    # invalid blocks are shown as is instead of stopping the filter
+    assert [type(elem) for elem in doc.content] == [Table, CodeBlock, CodeBlock, CodeBlock]
+
+
+@mark.parametrize('ext', ('.gz', '.bz2', '.xz', '.zst'))
+def test_compressed_include(tmp_path, ext, monkeypatch):
+    from pantable.io import detect_compression
+
+    if ext == '.zst':
+        importorskip('zstandard')
+    table = [['a', 'b'], ['1', 'é'], ['3', '4']]
+    data = to_array_naive(table)
+    path = tmp_path / f'table.csv{ext}'
+    options = PanTableOption(include=str(path), include_encoding='utf-8')
+    assert options.format == 'csv'
+    assert dump_csv_io(data, options) == ''
+    # detected by magic bytes too
+    path_renamed = tmp_path / 'table.csv'
+    path.rename(path_renamed)
+    assert detect_compression(path_renamed) == detect_compression(path, magic=False)
+    for include_index in (False, True):
+        options = PanTableOption(include=str(path_renamed), include_encoding='utf-8', include_index=include_index, tail=1)
+        np.testing.assert_array_equal(load_csv_array('', options), data[[0, 2]])
+    # streamed in full, instead of decompressed at once to be split
+    monkeypatch.setattr(pantable.io, 'split_csv', None)
+    np.testing.assert_array_equal(load_csv_array('', PanTableOption(include=str(path_renamed), include_encoding='utf-8')), data)
+
+
+def test_detect_compression_plain(tmp_path):
+    from pantable.io import detect_compression
+
+    path = tmp_path / 'table.csv'
+    # a plain file starting like the header of bz2
+    path.write_text('BZh,x\n1,2\n', encoding='utf-8')
+    assert detect_compression(path) is None
+    np.testing.assert_array_equal(load_csv_array('', PanTableOption(include=str(path), include_encoding='utf-8')), [['BZh', 'x'], ['1', '2']])
+    path.write_bytes(bz2.compress(b''))
+    assert detect_compression(path) == 'bz2'
+
+
+def test_load_include_files(tmp_path):
+    from pantable.codeblock_to_table import codeblock_to_table
+    from pantable.io import expand_include, load_include_files
+
+    for k in range(12):
+        path = tmp_path / f'shard-{k:02}.csv'
+        path.write_text(f'a,b\n{k},x\n{k},y\n', encoding='utf-8')
+    (tmp_path / 'shard-99.csv').write_text('a,b,c\n', encoding='utf-8')
+    pattern = str(tmp_path / 'shard-*.csv')
+    paths = expand_include(pattern)
+    assert paths == sorted(paths) and len(paths) == 13
+    assert expand_include(str(tmp_path / 'shard-00.csv')) is None
+    with raises(FileNotFoundError):
+        expand_include([pattern, str(tmp_path / 'missing-*.csv')])
+    with raises(ValueError):
+        expand_include([])
+    # shown as is instead of deleted
+    assert codeblock_to_table(options={'include': []}, data='a,b\n') is None
+
+    options = PanTableOption(include=pattern, include_encoding='utf-8', tail=3)
+    res = load_include_files(load_csv_array, '', options, paths)
+    np.testing.assert_array_equal(res, [['a', 'b', ''], ['10', 'y', ''], ['11', 'x', ''], ['11', 'y', '']])
+
+    options = PanTableOption(include=paths[:2], include_encoding='utf-8', header=False)
+    res = load_include_files(load_csv_array, '', options, paths[:2])
+    np.testing.assert_array_equal(res, [['a', 'b'], ['0', 'x'], ['0', 'y'], ['a', 'b'], ['1', 'x'], ['1', 'y']])
+
+
+@mark.parametrize('text', (
+    'a,b\nc,d\n',
+    'a,b\r\nc\r\rd,e,f',
+    '\n\na\n\n',
+    ' , \n',
+    'a\tb\n\tc\t\n',
+))
+@mark.parametrize('csv_kwargs', ({}, {'dialect': 'excel-tab'}, {'delimiter': '|', 'quoting': csv.QUOTE_NONE}))
+def test_split_csv(text, csv_kwargs):
+    from pantable.io import split_csv
+
+    lengths = []
+    try:
+        res = rows_to_array(lengths.append(len(row)) or row for row in csv.reader(io.StringIO(text, newline=''), **csv_kwargs))
+    except EmptyTableError:
+        with raises(EmptyTableError):
+            split_csv(text, csv_kwargs)
+    else:
+        res_split, lengths_split = split_csv(text, csv_kwargs)
+        np.testing.assert_array_equal(res_split, res)
+        np.testing.assert_array_equal(lengths_split, lengths)
+
+
+def test_split_csv_fallback():
+    from pantable.io import split_csv
+
+    assert split_csv('"a,b",c\n', {}) is None
+    assert split_csv('a,b\n', {'skipinitialspace': True}) is None
+    assert split_csv('a,b\n', {'quoting': csv.QUOTE_NONNUMERIC}) is None
+    # quotes are literal with QUOTE_NONE
+    np.testing.assert_array_equal(split_csv('a|"b"\n', {'delimiter': '|', 'quoting': csv.QUOTE_NONE})[0], [['a', '"b"']])
+
+
+@mark.parametrize('csv_kwargs', [
+    {},
+    {'dialect': 'unix'},
+    {'dialect': 'excel-tab'},
+    {'delimiter': '|', 'quotechar': "'", 'lineterminator': '\n'},
+    {'escapechar': '\\', 'doublequote': False},
+    {'quoting': csv.QUOTE_ALL},
+])
+@mark.parametrize('table', [
+    [['a', 'b'], ['1', '2']],
+    [['a', 'b,c'], ['1', '"2"'], ['x\ny', "'"], ['\t', '|']],
+    [[''], ['a'], ['']],
+    [['a\0b', 'c'], ['d', 'e,f']],
+    [[1, 'a'], ['b', 2.]],
+])
+def test_write_csv(table, csv_kwargs):
+    data = np.empty((len(table), len(table[0])), dtype=np.object_)
+    data[:] = table
+    with io.StringIO(newline='') as f:
+        csv.writer(f, **csv_kwargs).writerows(data)
+        expected = f.getvalue()
+    with io.StringIO(newline='') as f:
+        write_csv(data, f, csv_kwargs)
+        assert f.getvalue() == expected
+
+
+def test_dump_csv_io_include(tmp_path):
+    data = to_array_naive([['a', 'b,c'], ['1', 'é']])
+    path = tmp_path / 'dir' / 'table.csv'
+    options = PanTableOption(include=str(path), include_encoding='utf-8')
+    assert dump_csv_io(data, options) == ''
+    assert path.read_bytes() == dump_csv(data, options).encode('utf-8')
+    # existing files are not overwritten, and the data is dumped instead
+    assert dump_csv_io(data, options) == dump_csv(data, options)
+    assert options.include == ''
+
+
+@mark.parametrize('ext', ['', '.gz'])
+def test_write_include_overwrite(tmp_path, ext):
+    from pantable.io import write_include
+
+    path = tmp_path / f'table.csv{ext}'
+    data = to_array_naive([['a', 'b'], ['1', '2']])
+    options = PanTableOption(include=str(path), include_encoding='utf-8')
+    assert dump_csv_io(data, options) == ''
+    content = path.read_bytes()
+    mtime_ns = path.stat().st_mtime_ns
+
+    def write(f):
+        f.write(content)
+
+    with raises(FileExistsError):
+        write_include(path, write, overwrite='never')
+    compression = 'gzip' if ext else None
+    assert not write_include(path, write, compression=compression, overwrite='changed')
+    assert path.stat().st_mtime_ns == mtime_ns
+    assert write_include(path, write, compression=compression, overwrite='always')
+    # a failed write leaves the file as is
+    with raises(FileExistsError):
+        write_include(path, lambda f: f.write(b'x'), overwrite='never')
+    assert path.read_bytes() == content
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_dump_csv_io_overwrite(tmp_path, monkeypatch):
+    from pantable.io import get_overwrite, set_overwrite
+
+    monkeypatch.setattr(pantable.io, '_overwrite', None)
+    monkeypatch.setenv('PANTABLEOVERWRITE', 'Changed')
+    assert get_overwrite() == 'changed'
+    path = tmp_path / 'table.csv'
+    for table in ([['a', 'b'], ['1', '2']], [['a', 'b'], ['1', '2']], [['a', 'b'], ['3', '4']]):
+        data = to_array_naive(table)
+        options = PanTableOption(include=str(path), include_encoding='utf-8')
+        assert dump_csv_io(data, options) == ''
+        np.testing.assert_array_equal(load_csv_array('', options), data)
+    set_overwrite('invalid')
+    assert get_overwrite() == 'never'
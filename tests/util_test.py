@@ -1,6 +1,8 @@
+from panflute.elements import ListContainer, Para, Plain, SoftBreak, Space, Str, Strong
 from pytest import mark
 
-from pantable.util import convert_texts, convert_texts_fast, eq_panflute_elems
+from pantable.util import (convert_texts, convert_texts_fast, eq_panflute_elems, is_plain_markdown,
+                           panflute_to_plain_markdown, plain_markdown_to_panflute)
 
 # construct some texts cases
 texts_1 = [
@@ -33,3 +35,72 @@ def test_convert_texts_markdown_to_panflute(elems, texts):
 @mark.parametrize('elems,texts', zip(elemss, textss))
 def test_convert_texts_panflute_to_markdown(elems, texts):
     assert texts == convert_texts_fast(elems, input_format='panflute', output_format='markdown')
+
+
+def test_convert_texts_dedup(monkeypatch):
+    import pantable.util
+    from pantable.cache import get_cache, set_cache
+
+    calls = []
+    convert_text_orig = pantable.util.convert_text
+
+    def convert_text_counted(text, *args, **kwargs):
+        calls.append(text)
+        return convert_text_orig(text, *args, **kwargs)
+
+    monkeypatch.setattr(pantable.util, 'convert_text', convert_text_counted)
+    cache = get_cache()
+    set_cache(None)
+    try:
+        texts = texts_1 * 3
+        elems = convert_texts_fast(texts)
+        assert calls[-1].count('PanTableDiv') == len(texts_1)
+        assert eq_panflute_elems(elems, convert_texts(texts))
+        # repeated texts do not share mutable AST
+        assert len({id(elem) for elem in elems}) == len(texts)
+        assert texts == convert_texts_fast(elems, input_format='panflute', output_format='markdown')
+        assert len(calls[-1]) == 2 * len(texts_1)
+    finally:
+        set_cache(cache)
+
+
+texts_plain = ['42', 'foo  bar', '', '   3.14 %', '1,000/2 = 500: ok?!', 'x.y end.', 'a - b', 'é 中']
+texts_not_plain = ['    code', '1.', 'iv. x', 'Mr. Smith', 'a--b', 'wait...', '- x', '*x*', 'a\nb', "it's", '#1']
+
+
+@mark.parametrize('text', texts_plain)
+def test_plain_markdown_to_panflute(text):
+    assert eq_panflute_elems(plain_markdown_to_panflute(text), convert_texts([text])[0])
+
+
+@mark.parametrize('text', texts_not_plain)
+def test_is_plain_markdown(text):
+    assert not is_plain_markdown(text)
+    assert plain_markdown_to_panflute(text) is None
+
+
+elems_plain = [
+    ListContainer(),
+    ListContainer(Plain(Str('42'))),
+    ListContainer(Plain(Str('a*b'), Space(), Str('[1]'), SoftBreak(), Str('<x>'))),
+    ListContainer(Para(Str('one'), Space(), Str("it's")), Para(Str('two'))),
+    ListContainer(Plain(*(Str('ab') if i % 2 == 0 else Space() for i in range(47)))),
+]
+elems_not_plain = [
+    ListContainer(Plain(Strong(Str('a')))),
+    ListContainer(Plain(Str('a')), Plain(Str('b'))),
+    ListContainer(Plain(Str('1.'))),
+    ListContainer(Plain(Str('!['))),
+    ListContainer(Plain(Str('a'), Space(), Space(), Str('b'))),
+    ListContainer(Plain(*(Str('ab') if i % 2 == 0 else Space() for i in range(49)))),
+]
+
+
+@mark.parametrize('elem', elems_plain)
+def test_panflute_to_plain_markdown(elem):
+    assert panflute_to_plain_markdown(elem) == convert_texts([elem], input_format='panflute', output_format='markdown')[0]
+
+
+@mark.parametrize('elem', elems_not_plain)
+def test_panflute_to_plain_markdown_not_plain(elem):
+    assert panflute_to_plain_markdown(elem) is None